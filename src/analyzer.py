@@ -0,0 +1,120 @@
+from chord_symbol import ChordSymbol, parse_chord_symbol
+from functools import lru_cache
+from key_detection import bitmap_counts
+from multiprocessing import Pool
+from records import ProgressionRecord
+from scale import Scale
+from typing import Iterable, Iterator
+import numpy as np
+
+# Harmonic analysis of a corpus of chord progressions, one progression per line, with chord
+# symbols separated by whitespace (bar lines "|" are ignored).
+#
+# Each window of consecutive chords in a progression is matched to the scale that fits its
+# notes best, by key_detector, with the notes of each chord counted once, and the window's
+# first chord's root as the tonic. The windows of a chunk of lines are all scored at once.
+
+# Lines sent to each worker at a time
+_chunk_size = 256
+
+
+@lru_cache(maxsize=65536)
+def _parse(symbol: str) -> tuple[ChordSymbol, int] | None:
+    # The chord symbol and its pitch classes, that every window it's in needs
+    c = parse_chord_symbol(symbol)
+    return None if c is None else (c, c.pitch_classes())
+
+
+def analyze_progressions(
+    lines: list[tuple[int, str]], window: int = 4
+) -> list[ProgressionRecord]:
+    # Records for each line and its line number
+    from key_detection import key_detector
+
+    parsed_lines = list()
+    # The pitch classes of every chord, the position in them that each window starts at,
+    # and each window's tonic and pitch classes
+    chord_pitch_classes: list[int] = list()
+    starts: list[int] = list()
+    tonics: list[int] = list()
+    window_pitch_classes: list[int] = list()
+    for n, line in lines:
+        chords: list[ChordSymbol] = list()
+        unparsed: list[str] = list()
+        for symbol in line.split():
+            if symbol == "|":
+                continue
+            parsed = _parse(symbol)
+            if parsed is None:
+                unparsed.append(symbol)
+            else:
+                chords.append(parsed[0])
+                chord_pitch_classes.append(parsed[1])
+        parsed_lines.append((n, chords, unparsed))
+
+        first = len(chord_pitch_classes) - len(chords)
+        for start in range(0, len(chords), window):
+            starts.append(first + start)
+            tonics.append(chords[start].root.semitone)
+            pitch_classes = 0
+            for pc in chord_pitch_classes[first + start : first + start + window]:
+                pitch_classes |= pc
+            window_pitch_classes.append(pitch_classes)
+
+    best: list[Scale] = list()
+    if starts:
+        # Windows don't span lines, so each window's chords are up to the next window start
+        counts = np.add.reduceat(bitmap_counts(chord_pitch_classes), starts, axis=0)
+        best = key_detector.best(counts, tonics)
+
+    records = list()
+    windows = iter(zip(best, window_pitch_classes))
+    for n, chords, unparsed in parsed_lines:
+        scales = list()
+        for _ in range(0, len(chords), window):
+            (s, pitch_classes) = next(windows)
+            scales.append((s, (pitch_classes & ~s.pitch_class_bitmap).bit_count()))
+        records.append(ProgressionRecord(n, chords, unparsed, scales))
+    return records
+
+
+def analyze_progression(
+    line_number: int, line: str, window: int = 4
+) -> ProgressionRecord:
+    return analyze_progressions([(line_number, line)], window)[0]
+
+
+def _analyze_chunk(args: tuple[list[tuple[int, str]], int]) -> list[ProgressionRecord]:
+    return analyze_progressions(*args)
+
+
+def _chunks(
+    lines: Iterable[str], window: int
+) -> Iterator[tuple[list[tuple[int, str]], int]]:
+    chunk: list[tuple[int, str]] = list()
+    for n, line in enumerate(lines, 1):
+        if line.strip():
+            chunk.append((n, line))
+        if len(chunk) == _chunk_size:
+            yield (chunk, window)
+            chunk = list()
+    if chunk:
+        yield (chunk, window)
+
+
+def analyze_lines(
+    lines: Iterable[str], window: int = 4, workers: int = 1
+) -> Iterator[ProgressionRecord]:
+    # Records for each non-blank line, in order, streamed as the lines are read
+    if workers <= 1:
+        for chunk in _chunks(lines, window):
+            yield from _analyze_chunk(chunk)
+        return
+
+    # Build the indexes before starting the workers, so forked workers inherit them
+    from chord_symbol import chord_symbol_parser
+    from key_detection import key_detector
+
+    with Pool(workers) as pool:
+        for records in pool.imap(_analyze_chunk, _chunks(lines, window)):
+            yield from records
@@ -0,0 +1,411 @@
+from chord_label import (
+    ChordLabelIndex,
+    _extended_passes,
+    _extended_prune,
+    _generate_values,
+)
+from collections import namedtuple
+from fnmatch import fnmatch
+from interval import Interval, interval_index
+from interval_set import IntervalSet
+from note import Note, valid_notes_names
+from scale import Scale
+from scale_label import scale_label_index
+from typing import Any, Callable
+import click
+import json
+import numpy as np
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import timeit
+
+# Benchmarks of the hot paths, whose results can be saved as a JSON baseline, and compared
+# against one to catch performance regressions. For example:
+#   python src/benchmark.py --save baseline.json
+#   (make some changes)
+#   python src/benchmark.py --compare baseline.json --threshold 10
+# Baselines are only comparable on the same machine and Python version.
+
+
+# The original step-by-step implementations, kept as the reference the closed-form
+# arithmetic has to agree with.
+def _walk_sub(i2: Interval, i1: Interval) -> Interval:
+    rel_major_scale_degrees = 1
+    rel_semitones = 0
+    for curr_major_scale_degree in range(
+        i1.major_scale_degree + 1, i2.major_scale_degree + 1
+    ):
+        rel_major_scale_degrees += 1
+        if curr_major_scale_degree in (4, 8, 11, 15):
+            rel_semitones -= 1
+        if rel_major_scale_degrees in (4, 8, 11, 15):
+            rel_semitones += 1
+
+    rel_semitones += i2.rel_semitones
+    rel_semitones -= i1.rel_semitones
+    return Interval(rel_major_scale_degrees, rel_semitones)
+
+
+def _walk_normalize_octave_ex(i: Interval) -> tuple[Interval, int]:
+    x_major_scale_degrees = i.major_scale_degree
+    x_rel_octave = 0
+    while x_major_scale_degrees >= 8:
+        x_rel_octave += 1
+        x_major_scale_degrees -= 7
+    while x_major_scale_degrees < 0:
+        x_rel_octave -= 1
+        x_major_scale_degrees += 7
+    return (Interval(x_major_scale_degrees, i.rel_semitones), x_rel_octave)
+
+
+def check_interval_arithmetic():
+    intervals = [Interval(d, r) for d in range(1, 30) for r in (-2, -1, 0, 1, 2)]
+    for i1 in intervals:
+        if i1.normalize_octave_ex() != _walk_normalize_octave_ex(i1):
+            raise AssertionError(f"normalize_octave_ex({i1})")
+        for i2 in intervals:
+            if i2 - i1 is not _walk_sub(i2, i1):
+                raise AssertionError(f"{i2} - {i1}")
+
+    values = interval_index.values
+    for x in range(len(values)):
+        for y in range(len(values)):
+            if interval_index.diff(x, y) is not _walk_sub(values[y], values[x]):
+                raise AssertionError(f"diff({x}, {y})")
+
+
+### Benchmarks
+# A benchmark's setup returns the function to time, so that the setup itself isn't timed.
+# Each benchmark is timed as the best of a number of runs of as many calls as take at least
+# 0.2s (see timeit.Timer.autorange). The runs are taken in rounds of every benchmark, so that
+# each benchmark's runs are spread over the whole time the benchmarks take, rather than all
+# falling in a spell of the machine being busy or throttled. A benchmark's noise is how much
+# slower its median run is than its best, as a percentage.
+Benchmark = namedtuple("Benchmark", ["name", "setup"])
+
+
+def _sub_setup() -> Callable[[], Any]:
+    i1 = interval_index.get("b3")
+    i2 = interval_index.get("#11")
+    return lambda: i2 - i1
+
+
+def _walk_sub_setup() -> Callable[[], Any]:
+    i1 = interval_index.get("b3")
+    i2 = interval_index.get("#11")
+    return lambda: _walk_sub(i2, i1)
+
+
+def _diff_setup() -> Callable[[], Any]:
+    x = interval_index.position(interval_index.get("b3"))
+    y = interval_index.position(interval_index.get("#11"))
+    return lambda: interval_index.diff(x, y)
+
+
+def _normalize_octave_ex_setup() -> Callable[[], Any]:
+    return interval_index.get("#11").normalize_octave_ex
+
+
+def _walk_normalize_octave_ex_setup() -> Callable[[], Any]:
+    i = interval_index.get("#11")
+    return lambda: _walk_normalize_octave_ex(i)
+
+
+def _note_add_setup() -> Callable[[], Any]:
+    n = Note("Eb")
+    i = interval_index.get("#11")
+    return lambda: n.add(i)
+
+
+def _note_add_uncached_setup() -> Callable[[], Any]:
+    n = Note("Eb")
+    i = interval_index.get("#11")
+    return lambda: n._add(i)
+
+
+def _scale_setup() -> Callable[[], Any]:
+    r = Note("Eb")
+    sl = scale_label_index.by_name("dorian")
+    return lambda: Scale(r, sl)
+
+
+def _relative_to_setup() -> Callable[[], Any]:
+    s = IntervalSet(("1", "2", "b3", "4", "5", "6", "b7"))
+    return lambda: s.relative_to("5")
+
+
+def _scale_label_relative_to_setup() -> Callable[[], Any]:
+    # A lookup of one of the precomputed rotations
+    sl = scale_label_index.by_name("dorian")
+    return lambda: sl.relative_to("5")
+
+
+def _modes_setup() -> Callable[[], Any]:
+    from scale_label import mode_family_index
+
+    # The notes of C ionian, in semitones above A
+    pitch_classes = sum(1 << pc for pc in (3, 5, 7, 8, 10, 0, 2))
+    return lambda: mode_family_index.modes(pitch_classes)
+
+
+def _by_intervals_setup() -> Callable[[], Any]:
+    from chord_label import chord_label_index
+
+    intervals = chord_label_index.by_name("m7").intervals
+    return lambda: chord_label_index.by_intervals(intervals)
+
+
+def _by_key_setup() -> Callable[[], Any]:
+    from chord_label import chord_label_index
+
+    key = chord_label_index.by_name("m7").key
+    return lambda: chord_label_index.by_key(key)
+
+
+def _chord_labels_setup(*args) -> Callable[[], Callable[[], Any]]:
+    return lambda: lambda: ChordLabelIndex(_generate_values(*args))
+
+
+def _relationships_setup() -> Callable[[], Any]:
+    from chord_label import chord_label_index
+    from relationship import _build_relationships
+
+    return lambda: _build_relationships(chord_label_index)
+
+
+def _dump_chords_setup() -> Callable[[], Any]:
+    import program
+
+    # Build the engine before timing
+    from chord_scale_engine import chord_scale_engine
+
+    program.data_dir = os.path.join(_scratch_dir, "dump_chords")
+    r = Note("Eb")
+    sl = scale_label_index.by_name("dorian")
+    return lambda: program.dump_chords(sl, r, "chords_Eb_dorian")
+
+
+def _scale_voicings_setup() -> Callable[[], Any]:
+    from voicing import VoicingConstraints, scale_voicings
+
+    # Build the engine before timing
+    from chord_scale_engine import chord_scale_engine
+
+    r = Note("C")
+    sl = scale_label_index.by_name("ionian")
+    constraints = VoicingConstraints(voices=4, max_span=19, low=40, high=76)
+    return lambda: sum(1 for _ in scale_voicings(sl, r, constraints))
+
+
+def _parse_chord_symbols_setup() -> Callable[[], Any]:
+    from chord_symbol import chord_symbol_parser
+
+    # Uncached, in raw, prettified and alias forms
+    symbols = ["C", "F#m7", "B♭ø7/F", "Ebmin(maj7)", "G7(b9)", "C(no5)M#9#11"]
+    return lambda: [chord_symbol_parser.parse(s) for s in symbols]
+
+
+def _key_detection_setup() -> Callable[[], Any]:
+    from key_detection import key_detector
+
+    # 1000 random bags of notes, scored against every scale at once
+    counts = np.random.default_rng(0).integers(0, 4, (1000, 12))
+    tonics = list(range(12)) * 83 + list(range(4))
+    return lambda: key_detector.best(counts, tonics)
+
+
+def _analyze_setup() -> Callable[[], Any]:
+    from analyzer import analyze_lines
+    from chord_label import chord_label_index
+
+    # Progressions of 8 random chords, with the default chord labels on every root note.
+    # The parser and scale caches are warm after the first call, as they are for most of a
+    # large corpus.
+    symbols = [
+        r + cl.name for r in valid_notes_names for cl in chord_label_index.values()
+    ]
+    rng = random.Random(0)
+    lines = [" ".join(rng.choices(symbols, k=8)) for _ in range(1000)]
+    return lambda: sum(1 for _ in analyze_lines(lines))
+
+
+def _program_setup() -> Callable[[], Any]:
+    # Every data file, written from scratch by a new process
+    program = os.path.join(os.path.dirname(os.path.abspath(__file__)), "program.py")
+    data_dir = os.path.join(_scratch_dir, "program")
+    return lambda: subprocess.run(
+        [sys.executable, program, "--data-dir", data_dir, "--force"],
+        check=True,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+# Directory that benchmarks write their files to, which is removed afterwards
+_scratch_dir = ""
+
+_benchmarks = [
+    Benchmark("Interval.__sub__", _sub_setup),
+    Benchmark("Interval.__sub__ (walk)", _walk_sub_setup),
+    Benchmark("IntervalIndex.diff", _diff_setup),
+    Benchmark("Interval.normalize_octave_ex", _normalize_octave_ex_setup),
+    Benchmark(
+        "Interval.normalize_octave_ex (walk)",
+        _walk_normalize_octave_ex_setup,
+    ),
+    Benchmark("Note.add", _note_add_setup),
+    Benchmark("Note.add (uncached)", _note_add_uncached_setup),
+    Benchmark("Scale.__init__", _scale_setup),
+    Benchmark("IntervalSet.relative_to", _relative_to_setup),
+    Benchmark("ScaleLabel.relative_to", _scale_label_relative_to_setup),
+    Benchmark("ModeFamilyIndex.modes", _modes_setup),
+    Benchmark("ChordLabelIndex.by_intervals", _by_intervals_setup),
+    Benchmark("ChordLabelIndex.by_key", _by_key_setup),
+    Benchmark("Chord labels (default)", _chord_labels_setup()),
+    Benchmark(
+        "Chord labels (extended)",
+        _chord_labels_setup(_extended_passes, _extended_prune),
+    ),
+    Benchmark(
+        "Chord labels (extended, unpruned)",
+        _chord_labels_setup(_extended_passes),
+    ),
+    Benchmark("Relationships", _relationships_setup),
+    Benchmark("dump_chords (Eb dorian)", _dump_chords_setup),
+    Benchmark("Voicings (C ionian, 4 voices)", _scale_voicings_setup),
+    Benchmark("ChordSymbolParser.parse", _parse_chord_symbols_setup),
+    Benchmark("KeyDetector.best (1000 bags)", _key_detection_setup),
+    Benchmark("Analyze (1000 progressions)", _analyze_setup),
+    Benchmark("program.py", _program_setup),
+]
+
+
+def run(benchmarks: list[Benchmark], rounds: int) -> list[tuple[float, float]]:
+    # Seconds per call, and the noise, of each benchmark
+    timers = [timeit.Timer(b.setup()) for b in benchmarks]
+    numbers = [t.autorange()[0] for t in timers]
+    times: list[list[float]] = [list() for _ in benchmarks]
+    for _ in range(rounds):
+        for t, number, ts in zip(timers, numbers, times):
+            ts.append(t.timeit(number) / number)
+    results = list()
+    for ts in times:
+        ts.sort()
+        results.append((ts[0], (ts[len(ts) // 2] / ts[0] - 1) * 100))
+    return results
+
+
+def _format_time(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:10.3f} ms"
+    return f"{seconds * 1e6:10.3f} us"
+
+
+### Command line
+@click.command()
+@click.option(
+    "--only",
+    "patterns",
+    multiple=True,
+    help="Only run the benchmarks whose names match this glob. Can be repeated.",
+)
+@click.option(
+    "--save",
+    "save_path",
+    type=click.Path(dir_okay=False),
+    help="Save the results as a baseline to this JSON file.",
+)
+@click.option(
+    "--compare",
+    "compare_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Compare the results against the baseline in this JSON file.",
+)
+@click.option(
+    "--threshold",
+    default=10.0,
+    show_default=True,
+    type=click.FloatRange(min=0),
+    help="Percentage slower than the baseline, beyond the noise of either, that counts as "
+    "a regression.",
+)
+@click.option(
+    "--rounds",
+    default=9,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of times to run each benchmark.",
+)
+def cli(
+    patterns: tuple[str, ...],
+    save_path: str | None,
+    compare_path: str | None,
+    threshold: float,
+    rounds: int,
+):
+    """Check the interval arithmetic, then time the hot paths.
+
+    Exits with status 1 if any benchmark regressed past the threshold, plus the noise of
+    the benchmark in the baseline or in this run, whichever is larger.
+    """
+    check_interval_arithmetic()
+
+    baseline: dict[str, float] = dict()
+    baseline_noise: dict[str, float] = dict()
+    if compare_path is not None:
+        with open(compare_path, encoding="utf8") as f:
+            saved = json.load(f)
+        baseline = saved["results"]
+        baseline_noise = saved.get("noise", dict())
+
+    global _scratch_dir
+    results: dict[str, float] = dict()
+    noise: dict[str, float] = dict()
+    regressions = list()
+    with tempfile.TemporaryDirectory() as _scratch_dir:
+        benchmarks = [
+            b
+            for b in _benchmarks
+            if not patterns or any(fnmatch(b.name, p) for p in patterns)
+        ]
+        for b, (seconds, spread) in zip(benchmarks, run(benchmarks, rounds)):
+            results[b.name] = seconds
+            noise[b.name] = spread
+            line = f"{b.name:40} {_format_time(seconds)} ±{spread:4.1f}%"
+            if b.name in baseline:
+                change = (seconds / baseline[b.name] - 1) * 100
+                band = max(spread, baseline_noise.get(b.name, 0.0))
+                line += f" {change:+7.1f}%"
+                if change > threshold + band:
+                    line += "  REGRESSION"
+                    regressions.append(b.name)
+            click.echo(line)
+
+    if save_path is not None:
+        with open(save_path, "w", encoding="utf8") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": results,
+                    "noise": noise,
+                },
+                f,
+                indent=1,
+            )
+            print(file=f)
+
+    if regressions:
+        click.echo(
+            f"{len(regressions)} benchmarks are more than {threshold}% slower "
+            "than the baseline, beyond the noise",
+            err=True,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
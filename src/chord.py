@@ -1,5 +1,9 @@
 from chord_label import ChordLabel, ChordLabelIndex
-from note import Note
+from collections import namedtuple
+from functools import lru_cache
+from interval_set import Bitmap, rotate_pitch_classes
+from lazy import module_getattr
+from note import Note, root_notes
 from prettify import prettify
 from typing import Iterable
 
@@ -30,3 +34,119 @@ class ChordIndex:
 
     def by_name(self, name: str):
         return self._by_name[name]
+
+
+# A chord that matches a set of notes.
+# * root: The root of the chord, spelled as played if it was played
+# * inversion: Whether the lowest note played is not the root
+# * missing: The number of the chord's pitch classes that were not played
+# * extra: The number of pitch classes played that are not in the chord
+ChordMatch = namedtuple(
+    "ChordMatch", ["root", "chord_label", "inversion", "missing", "extra"]
+)
+
+
+def _bit_count(bitmap: int) -> int:
+    return bin(bitmap).count("1")
+
+
+# The spelling used for a chord root that wasn't played
+_root_note_by_semitone: dict[int, Note] = dict()
+for n in root_notes:
+    _root_note_by_semitone.setdefault(n.semitone, n)
+
+
+class ChordIdentificationIndex:
+    def __init__(self, chord_label_index: ChordLabelIndex):
+        # Every (root pitch class, chord label) by the 12-bit bitmap of pitch classes it sounds,
+        # and by every other non-empty subset of those pitch classes.
+        self._exact: list[list[tuple[int, ChordLabel]]] = [list() for _ in range(4096)]
+        self._partial: dict[Bitmap, list[tuple[int, ChordLabel]]] = dict()
+
+        for cl in chord_label_index.values():
+            pitch_classes = cl.semitone_bitmap.pitch_classes()
+            for root in range(12):
+                bitmap = rotate_pitch_classes(pitch_classes, root)
+                self._exact[bitmap].append((root, cl))
+
+                subset = (bitmap - 1) & bitmap
+                while subset:
+                    self._partial.setdefault(Bitmap(subset), list()).append((root, cl))
+                    subset = (subset - 1) & bitmap
+
+        self._ranked = lru_cache(maxsize=4096)(self._rank)
+
+    def __getstate__(self):
+        # The cache of ranked matches isn't pickled
+        state = self.__dict__.copy()
+        del state["_ranked"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._ranked = lru_cache(maxsize=4096)(self._rank)
+
+    def identify(self, notes: Iterable[str | Note]) -> list[ChordMatch]:
+        # The first note is taken to be the lowest one played
+        played: dict[int, Note] = dict()
+        for n in notes:
+            n = n if isinstance(n, Note) else Note(n)
+            played.setdefault(n.semitone, n)
+        if not played:
+            return []
+
+        bitmap = Bitmap(sum(1 << i for i in played.keys()))
+        bass = next(iter(played.keys()))
+        return [
+            ChordMatch(
+                played.get(root) or _root_note_by_semitone[root],
+                cl,
+                inversion,
+                missing,
+                extra,
+            )
+            for (root, cl, inversion, missing, extra) in self._ranked(bitmap, bass)
+        ]
+
+    def _rank(
+        self, bitmap: Bitmap, bass: int
+    ) -> tuple[tuple[int, ChordLabel, bool, int, int], ...]:
+        matches = list()
+
+        # Chords with exactly the notes played
+        for root, cl in self._exact[bitmap]:
+            matches.append((root, cl, root != bass, 0, 0))
+
+        # Chords with all of the notes played, and more
+        for root, cl in self._partial.get(bitmap, []):
+            missing = _bit_count(cl.semitone_bitmap.pitch_classes()) - _bit_count(
+                bitmap
+            )
+            matches.append((root, cl, root != bass, missing, 0))
+
+        # Chords with some of the notes played, and no others
+        subset = (bitmap - 1) & bitmap
+        while subset:
+            for root, cl in self._exact[subset]:
+                extra = _bit_count(bitmap & ~subset)
+                matches.append((root, cl, root != bass, 0, extra))
+            subset = (subset - 1) & bitmap
+
+        # Closest matches first, then root position before inversions, then chords that
+        # would need more notes before chords that would need fewer.
+        matches.sort(key=lambda m: (m[3] + m[4], m[2], m[4], m[1], m[0]))
+        return tuple(matches)
+
+
+chord_identification_index: ChordIdentificationIndex
+
+
+def _build_chord_identification_index() -> ChordIdentificationIndex:
+    from chord_label import chord_label_index
+
+    return ChordIdentificationIndex(chord_label_index)
+
+
+__getattr__ = module_getattr(
+    __name__, {"chord_identification_index": _build_chord_identification_index}
+)
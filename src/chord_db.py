@@ -0,0 +1,238 @@
+from collections import namedtuple
+from note import Note, root_notes, valid_notes_names
+from scale_label import scale_label_index
+from typing import Iterable, Iterator
+import mmap
+import struct
+
+# A binary database of every chord in every scale, that is read through mmap.
+#
+# Layout (all integers little-endian):
+# * Header: magic, format version, and the offset of each section below.
+# * String tables, for note names, chord label names and scale label names:
+#   count, then count + 1 uint32 offsets into the UTF-8 bytes that follow.
+# * Records, one per chord in a scale, in generation order (i.e. grouped by scale label, then
+#   scale root), each _record_format:
+#   scale label id, scale root id, chord root id, chord label id, pitch class bitmap,
+#   note count, and up to _max_notes spelled notes.
+#   Spelled notes are a note name id plus 64 times the note's octave above the scale root.
+# * Indexes, each CSR style: count + 1 uint32 offsets into the uint32 record ids that follow,
+#   so the record ids for key k are ids[offsets[k]:offsets[k + 1]].
+#   By scale: keyed by scale label id * note name count + scale root id.
+#   By chord label, by chord root and by 12-bit pitch class bitmap.
+
+_magic = b"HXCHDB"
+format_version = 1
+_header_format = "<6sH6I"
+_max_notes = 8
+_record_format = f"<BBBHHB{_max_notes}B"
+_record_size = struct.calcsize(_record_format)
+
+ChordDbRecord = namedtuple(
+    "ChordDbRecord",
+    ["scale_label", "scale_root", "chord_root", "chord_label", "bitmap", "notes"],
+)
+
+
+### Writing
+def _string_table(strings: list[str]) -> bytes:
+    encoded = [s.encode("utf8") for s in strings]
+    offsets = [0]
+    for e in encoded:
+        offsets.append(offsets[-1] + len(e))
+    return (
+        struct.pack(f"<I{len(offsets)}I", len(strings), *offsets)
+        + b"".join(encoded)
+        + b"\0" * (-offsets[-1] % 4)
+    )
+
+
+def _csr_index(keys: list[int], key_count: int) -> bytes:
+    # Record ids grouped by key, in record order within each key
+    counts = [0] * key_count
+    for k in keys:
+        counts[k] += 1
+    offsets = [0]
+    for c in counts:
+        offsets.append(offsets[-1] + c)
+    ids = [0] * len(keys)
+    next_position = offsets[:-1]
+    for record_id, k in enumerate(keys):
+        ids[next_position[k]] = record_id
+        next_position[k] += 1
+    return struct.pack(f"<I{len(offsets)}I{len(ids)}I", key_count, *offsets, *ids)
+
+
+def write_chord_db(path: str):
+    from chord_scale_engine import chord_scale_engine
+
+    note_ids = {n: x for (x, n) in enumerate(valid_notes_names)}
+    chord_label_names = [cl.name for cl in chord_scale_engine.chord_labels]
+    chord_label_ids = {n: x for (x, n) in enumerate(chord_label_names)}
+    scale_label_names = list(scale_label_index.names())
+
+    records = bytearray()
+    scale_keys = list()
+    chord_label_keys = list()
+    chord_root_keys = list()
+    bitmap_keys = list()
+    for x, sl in enumerate(scale_label_index.values()):
+        for r in root_notes:
+            for chord_root, chord_label, notes in chord_scale_engine.chords_in_scale(
+                sl, r
+            ):
+                bitmap = 0
+                for n in notes:
+                    bitmap |= 1 << n.semitone
+                spelled = [note_ids[n.name] + 64 * n.rel_octave for n in notes]
+                spelled += [0] * (_max_notes - len(spelled))
+                records += struct.pack(
+                    _record_format,
+                    x,
+                    note_ids[r.name],
+                    note_ids[chord_root.name],
+                    chord_label_ids[chord_label.name],
+                    bitmap,
+                    len(notes),
+                    *spelled,
+                )
+                scale_keys.append(x * len(note_ids) + note_ids[r.name])
+                chord_label_keys.append(chord_label_ids[chord_label.name])
+                chord_root_keys.append(note_ids[chord_root.name])
+                bitmap_keys.append(bitmap)
+
+    sections = [
+        _string_table(valid_notes_names),
+        _string_table(chord_label_names),
+        _string_table(scale_label_names),
+        struct.pack("<I", len(records) // _record_size) + bytes(records),
+        _csr_index(scale_keys, len(scale_label_names) * len(note_ids))
+        + _csr_index(chord_label_keys, len(chord_label_names))
+        + _csr_index(chord_root_keys, len(note_ids))
+        + _csr_index(bitmap_keys, 4096),
+    ]
+    offsets = list()
+    offset = struct.calcsize(_header_format)
+    for s in sections:
+        offsets.append(offset)
+        offset += len(s)
+        offset += -offset % 4
+    offsets.append(offset)
+
+    with open(path, "wb") as f:
+        f.write(struct.pack(_header_format, _magic, format_version, *offsets))
+        for s in sections:
+            f.write(s)
+            f.write(b"\0" * (-f.tell() % 4))
+
+
+### Reading
+class ChordDb:
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        (magic, version, *offsets) = struct.unpack_from(_header_format, self._view)
+        if magic != _magic or version != format_version:
+            raise ValueError(f"{path} is not a version {format_version} chord database")
+        (notes, chord_labels, scale_labels, records, indexes, _) = offsets
+
+        self.note_names = self._strings(notes)
+        self.chord_label_names = self._strings(chord_labels)
+        self.scale_label_names = self._strings(scale_labels)
+        self._note_ids = {n: x for (x, n) in enumerate(self.note_names)}
+        self._chord_label_ids = {n: x for (x, n) in enumerate(self.chord_label_names)}
+        self._scale_label_ids = {n: x for (x, n) in enumerate(self.scale_label_names)}
+
+        (self._record_count,) = struct.unpack_from("<I", self._view, records)
+        self._records = records + 4
+
+        self._by_scale, indexes = self._csr(indexes)
+        self._by_chord_label, indexes = self._csr(indexes)
+        self._by_chord_root, indexes = self._csr(indexes)
+        self._by_bitmap, indexes = self._csr(indexes)
+
+    def close(self):
+        self._by_scale = self._by_chord_label = self._by_chord_root = None
+        self._by_bitmap = None
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._record_count
+
+    def _strings(self, offset: int) -> list[str]:
+        (count,) = struct.unpack_from("<I", self._view, offset)
+        offsets = struct.unpack_from(f"<{count + 1}I", self._view, offset + 4)
+        data = offset + 4 * (count + 2)
+        return [
+            str(self._view[data + offsets[x] : data + offsets[x + 1]], "utf8")
+            for x in range(count)
+        ]
+
+    def _csr(self, offset: int):
+        # Views over an index's offsets and record ids, and the offset of the next index
+        (count,) = struct.unpack_from("<I", self._view, offset)
+        offsets = self._view[offset + 4 : offset + 4 * (count + 2)].cast("I")
+        ids_offset = offset + 4 * (count + 2)
+        ids = self._view[ids_offset : ids_offset + 4 * offsets[count]].cast("I")
+        return (offsets, ids), ids_offset + 4 * offsets[count]
+
+    def _lookup(self, index, key: int) -> Iterator[ChordDbRecord]:
+        (offsets, ids) = index
+        for record_id in ids[offsets[key] : offsets[key + 1]]:
+            yield self.record(record_id)
+
+    def record(self, record_id: int) -> ChordDbRecord:
+        if not 0 <= record_id < self._record_count:
+            raise IndexError(record_id)
+        (
+            scale_label,
+            scale_root,
+            chord_root,
+            chord_label,
+            bitmap,
+            note_count,
+            *notes,
+        ) = struct.unpack_from(
+            _record_format, self._view, self._records + record_id * _record_size
+        )
+        return ChordDbRecord(
+            self.scale_label_names[scale_label],
+            Note(self.note_names[scale_root]),
+            Note(self.note_names[chord_root]),
+            self.chord_label_names[chord_label],
+            bitmap,
+            tuple(Note(self.note_names[n % 64], n // 64) for n in notes[:note_count]),
+        )
+
+    def values(self) -> Iterable[ChordDbRecord]:
+        return map(self.record, range(self._record_count))
+
+    def by_scale(self, scale_label_name: str, root: str | Note) -> list[ChordDbRecord]:
+        root_name = root if isinstance(root, str) else root.name
+        key = (
+            self._scale_label_ids[scale_label_name] * len(self.note_names)
+            + self._note_ids[root_name]
+        )
+        return list(self._lookup(self._by_scale, key))
+
+    def by_chord_label(self, chord_label_name: str) -> list[ChordDbRecord]:
+        return list(
+            self._lookup(self._by_chord_label, self._chord_label_ids[chord_label_name])
+        )
+
+    def by_chord_root(self, root: str | Note) -> list[ChordDbRecord]:
+        root_name = root if isinstance(root, str) else root.name
+        return list(self._lookup(self._by_chord_root, self._note_ids[root_name]))
+
+    def by_bitmap(self, bitmap: int) -> list[ChordDbRecord]:
+        # Chords sounding exactly these pitch classes (in semitones above A)
+        return list(self._lookup(self._by_bitmap, bitmap))
@@ -1,8 +1,12 @@
+from collections import namedtuple
+from functools import cache, reduce
 from interval import Interval, interval_index
-from interval_set import IntervalSet
+from interval_set import IntervalSet, SemitoneSet
+from itertools import combinations
+from lazy import module_getattr
 from prettify import prettify
 from scale_label import ScaleLabel
-from typing import Iterable
+from typing import Callable, Iterable, Iterator
 
 
 class ChordLabel(IntervalSet):
@@ -143,49 +147,152 @@ _values: list[ChordLabel] = [
 # Omit 5th and 9th, (and possibly 11th)
 # Omit 7th and 11th => equivalent to 6/9
 
-### 9 chords
-# These are technically not the correct chord names, since '7add9' should just be written as '9'.
-# Just trying to keep it simple at first.
-for c in list(_values):
+
+### Extension rules
+#
+# Extensions and omissions are generated by passes over every chord label generated before the
+# pass. Whether a chord label is extended, and whether the result is kept, are decided with
+# semitone bitmaps (see IntervalSet.semitone_bitmap), before the new chord label is built.
+
+# Extends each chord label that contains none of the skip intervals, with every combination of
+# up to max_count of the extensions.
+ExtensionPass = namedtuple(
+    "ExtensionPass", ["skip", "extensions", "max_count"], defaults=[1]
+)
+
+# An extension interval, and the intervals that stop it being added to a chord label
+Extension = namedtuple("Extension", ["interval", "clashes"], defaults=[()])
+
+# Omits the interval from each chord label that contains it and all of the required intervals
+OmissionPass = namedtuple("OmissionPass", ["interval", "requires"], defaults=[()])
+
+_default_passes: list[ExtensionPass | OmissionPass] = [
+    ### 9 chords
+    # These are technically not the correct chord names, since '7add9' should just be written as '9'.
+    # Just trying to keep it simple at first.
+    #
     # 9 is octave away from 2, so 9 & sus2 are redundant, and #9 & sus2 are a b9 away from each other.
     # b9 & 2 are a M7 away from each other, but it's too dissonant to include for now until we have
     # better relationships implemented.
-    if interval_index.get("2") in c.intervals:
-        continue
-
     # dim chords are already dissonant enough to not extend them.
-    if interval_index.get("b5") in c.intervals:
-        continue
-
-    _values.append(c.extend_with("b9"))
-    _values.append(c.extend_with("9"))
-
     # #9 is same as b3, so don't add #9 if there is already b3
-    if not interval_index.get("b3") in c.intervals:
-        _values.append(c.extend_with("#9"))
-
-
-### 11 chords
-# These are technically not the correct chord names, since '7add9add11' should just be written as '11'.
-# Just trying to keep it simple at first.
-for c in list(_values):
-    # See note above about not generating rare chords (i.e. with internal b9's).
-    if interval_index.get("5") in c.intervals:
-        continue
-
+    ExtensionPass(
+        ("2", "b5"), [Extension("b9"), Extension("9"), Extension("#9", ("b3",))]
+    ),
+    ### 11 chords
+    # These are technically not the correct chord names, since '7add9add11' should just be written as '11'.
+    # Just trying to keep it simple at first.
+    #
+    # See note above about not generating rare chords (i.e. with internal b9's), so skip the 5.
     # 11 is octave away from 4, so 11 & sus4 are redundant, and #11 & sus4 are b9 away from each other.
-    if interval_index.get("4") in c.intervals:
-        continue
-
     # dim chords are already dissonant enough to not extend them.
-    if interval_index.get("b5") in c.intervals:
-        continue
+    ExtensionPass(
+        ("5", "4", "b5"), [Extension("11", ("3",)), Extension("#11", ("b3",))]
+    ),
+]
+
+# Every extension, alteration and omission, less the chord labels pruned by _extended_prune:
+# 578 chord labels, or 1278 unpruned. Nothing generates data files from them, but they can be
+# indexed with ChordLabelIndex(_generate_values(_extended_passes, _extended_prune)).
+_extended_passes: list[ExtensionPass | OmissionPass] = [
+    ExtensionPass(
+        (),
+        [Extension("b9"), Extension("9", ("b9",)), Extension("#9", ("b3", "9"))],
+        max_count=2,
+    ),
+    ExtensionPass((), [Extension("11"), Extension("#11", ("11",))]),
+    ExtensionPass(
+        (),
+        [Extension(Interval(13, -1)), Extension(Interval(13, 0), (Interval(13, -1),))],
+    ),
+    OmissionPass("5", ("3",)),
+    OmissionPass("5", ("b3",)),
+    OmissionPass("3", ("b7",)),
+]
 
-    if interval_index.get("3") not in c.intervals:
-        _values.append(c.extend_with("11"))
 
-    if interval_index.get("b3") not in c.intervals:
-        _values.append(c.extend_with("#11"))
+@cache
+def _semitones(intervals: tuple[str | Interval, ...]) -> int:
+    return SemitoneSet(interval_index.get(i).semitones for i in intervals).bitmap
+
+
+def _extensions(p: ExtensionPass, bitmap: int) -> Iterator[tuple[int, list[Interval]]]:
+    # The semitones of each combination of the pass's extensions that can be added to a chord
+    # label with these semitones, and the extension intervals
+    if bitmap & _semitones(p.skip):
+        return
+    for n in range(1, p.max_count + 1):
+        for extensions in combinations(p.extensions, n):
+            bitmap2 = bitmap
+            for e in extensions:
+                if bitmap2 & _semitones((e.interval, *e.clashes)):
+                    break
+                bitmap2 |= _semitones((e.interval,))
+            else:
+                yield (bitmap2, [interval_index.get(e.interval) for e in extensions])
+
+
+def _has_internal_b9(bitmap: int) -> bool:
+    # Whether any two notes other than the root are a b9 apart (or a b9 and an octave)
+    upper = bitmap & ~1
+    return upper & (upper << 13) != 0 or upper & (upper << 25) != 0
+
+
+def _has_repeated_pitch_class(bitmap: int) -> bool:
+    # Whether any two notes are the same pitch class, like 2 & 9, or 6 & 13
+    pitch_classes = 0
+    while bitmap:
+        if pitch_classes & bitmap & 0xFFF:
+            return True
+        pitch_classes |= bitmap & 0xFFF
+        bitmap >>= 12
+    return False
+
+
+_extended_prune: tuple[Callable[[int], bool], ...] = (
+    _has_internal_b9,
+    _has_repeated_pitch_class,
+)
+
+
+def _generate_values(
+    passes: Iterable[ExtensionPass | OmissionPass] = _default_passes,
+    prune: Iterable[Callable[[int], bool]] = (),
+) -> list[ChordLabel]:
+    prune = tuple(prune)
+    values = list(_values)
+    # Chord labels are only added once, by name and by their semitones
+    names = {c.name for c in values}
+    bitmaps = {c.semitone_bitmap.bitmap for c in values}
+
+    def add(bitmap: int, build: Callable[[], ChordLabel]):
+        if bitmap in bitmaps or any(f(bitmap) for f in prune):
+            return
+        c2 = build()
+        if c2.name not in names:
+            names.add(c2.name)
+            bitmaps.add(bitmap)
+            values.append(c2)
+
+    for p in passes:
+        for c in list(values):
+            bitmap = c.semitone_bitmap.bitmap
+            if isinstance(p, ExtensionPass):
+                for bitmap2, extensions in _extensions(p, bitmap):
+                    add(bitmap2, lambda: reduce(ChordLabel.extend_with, extensions, c))
+            else:
+                required = _semitones((p.interval, *p.requires))
+                if bitmap & required == required:
+                    omitted = interval_index.get(p.interval)
+                    add(
+                        bitmap & ~_semitones((p.interval,)),
+                        lambda: ChordLabel(
+                            [i for i in c.intervals if i is not omitted],
+                            f"{c.name}(no{omitted.name})",
+                        ),
+                    )
+
+    return values
 
 
 ### Index
@@ -193,12 +300,15 @@ class ChordLabelIndex:
     def __init__(self, values: Iterable[ChordLabel]):
         self._by_name: dict[str, ChordLabel] = dict()
         self._by_intervals: dict[Iterable[Interval], ChordLabel] = dict()
+        self._by_key: dict[int, ChordLabel] = dict()
 
         for v in values:
             if v.name in self._by_name.keys():
                 raise KeyError(v.name)
             self._by_name[v.name] = v
             self._by_intervals[v.intervals] = v
+            if v.key is not None:
+                self._by_key[v.key] = v
 
     def __repr__(self):
         return self.values().__repr__()
@@ -218,6 +328,10 @@ class ChordLabelIndex:
     def by_intervals(self, i: tuple[Interval, ...]):
         return self._by_intervals.get(i, None)
 
+    def by_key(self, key: int):
+        # See IntervalSet.key
+        return self._by_key.get(key, None)
+
     # def restrict(self, scale: ScaleLabel):
     #     return ChordLabelIndex(
     #         [
@@ -228,4 +342,9 @@ class ChordLabelIndex:
     #     )
 
 
-chord_label_index = ChordLabelIndex(_values)
+chord_label_index: ChordLabelIndex
+
+
+__getattr__ = module_getattr(
+    __name__, {"chord_label_index": lambda: ChordLabelIndex(_generate_values())}
+)
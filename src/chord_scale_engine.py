@@ -0,0 +1,112 @@
+from chord_label import ChordLabel
+from lazy import module_getattr
+from note import Note, root_notes
+from scale import Scale
+from scale_label import ScaleLabel, scale_label_index
+from typing import Iterable, Iterator
+import numpy as np
+
+
+class ChordScaleEngine:
+    def __init__(
+        self,
+        scale_labels: Iterable[ScaleLabel],
+        chord_labels: Iterable[ChordLabel],
+        roots: Iterable[Note],
+    ):
+        self.scale_labels = list(scale_labels)
+        self.chord_labels = sorted(chord_labels)
+        self.roots = list(roots)
+        self._scale_label_positions = {
+            sl.name: x for (x, sl) in enumerate(self.scale_labels)
+        }
+
+        degree_count = max(len(sl.intervals) for sl in self.scale_labels)
+
+        # The semitones of each scale label's degrees, padded out to the longest scale
+        degree_semitones = np.zeros(
+            (len(self.scale_labels), degree_count), dtype=np.int64
+        )
+        has_degree = np.zeros((len(self.scale_labels), degree_count), dtype=bool)
+        for x, sl in enumerate(self.scale_labels):
+            for d, i in enumerate(sl.intervals):
+                degree_semitones[x, d] = i.semitones
+                has_degree[x, d] = True
+
+        scale_bitmaps = np.array(
+            [sl.semitone_bitmap.bitmap for sl in self.scale_labels], dtype=np.int64
+        )
+        chord_bitmaps = np.array(
+            [cl.semitone_bitmap.bitmap for cl in self.chord_labels], dtype=np.int64
+        )
+
+        # Every chord label transposed onto every degree of every scale label,
+        # indexed by [scale label, chord root degree, chord label]
+        transposed = chord_bitmaps[None, None, :] << degree_semitones[:, :, None]
+
+        # Whether the transposed chord is in the scale, once folded into a single octave
+        folded = (transposed & 0xFFF) | (transposed >> 12)
+        self.contains = (
+            (folded & scale_bitmaps[:, None, None]) == folded
+        ) & has_degree[:, :, None]
+
+        # Bitmaps over the scale's degrees, of which degrees the transposed chord sounds in
+        # its first octave, and in the octave above that
+        degree_bits = np.where(has_degree, 1 << np.arange(degree_count), 0)
+        self.lower_degrees = (
+            ((transposed[..., None] >> degree_semitones[:, None, None, :]) & 1)
+            * degree_bits[:, None, None, :]
+        ).sum(axis=-1)
+        self.upper_degrees = (
+            ((transposed[..., None] >> (degree_semitones + 12)[:, None, None, :]) & 1)
+            * degree_bits[:, None, None, :]
+        ).sum(axis=-1)
+
+    def containment(self) -> np.ndarray:
+        # Whether a chord is in a scale doesn't depend on the scale's root, so this is a
+        # read-only view over the roots, indexed by
+        # [scale label, root, chord root degree, chord label]
+        return np.broadcast_to(
+            self.contains[:, None, :, :],
+            (
+                len(self.scale_labels),
+                len(self.roots),
+                self.contains.shape[1],
+                len(self.chord_labels),
+            ),
+        )
+
+    def chords_in_scale(
+        self, sl: ScaleLabel, root: Note
+    ) -> Iterator[tuple[Note, ChordLabel, tuple[Note, ...]]]:
+        x = self._scale_label_positions[sl.name]
+        s = Scale(root, sl)
+        notes = s.notes
+        upper_notes = [n.up_octave() for n in notes]
+
+        lower_degrees = self.lower_degrees[x].tolist()
+        upper_degrees = self.upper_degrees[x].tolist()
+        for d, y in zip(*np.nonzero(self.contains[x])):
+            lower = lower_degrees[d][y]
+            upper = upper_degrees[d][y]
+            chord_notes = tuple(
+                [n for (j, n) in enumerate(notes) if lower & (1 << j)]
+                + [n for (j, n) in enumerate(upper_notes) if upper & (1 << j)]
+            )
+            yield (notes[d], self.chord_labels[y], chord_notes)
+
+
+chord_scale_engine: ChordScaleEngine
+
+
+def _build_chord_scale_engine() -> ChordScaleEngine:
+    from chord_label import chord_label_index
+
+    return ChordScaleEngine(
+        scale_label_index.values(), chord_label_index.values(), root_notes
+    )
+
+
+__getattr__ = module_getattr(
+    __name__, {"chord_scale_engine": _build_chord_scale_engine}
+)
@@ -0,0 +1,148 @@
+from chord_label import ChordLabel, ChordLabelIndex
+from collections import namedtuple
+from functools import lru_cache
+from interval_set import Bitmap, rotate_pitch_classes
+from lazy import module_getattr
+from note import Note, valid_notes_names
+
+# Chord symbols, like F#m7 or B♭ø7/F: a root note name, a chord label name, and optionally a
+# slash and a bass note name.
+#
+# Symbols can be written with the chord label names, as prettified by prettify, or with common
+# aliases, such as Cmaj7, C-7, Cm7b5 or Co7. Aliases are single tokens, that are replaced as
+# the symbol is scanned, or whole chord label names.
+
+# Alias tokens, and the tokens of chord label names they're replaced with.
+# Tokens that contain an alias but aren't one, like the o in (no5), map to themselves.
+_token_aliases = {
+    "♭": "b",
+    "𝄫": "bb",
+    "♯": "#",
+    "𝄪": "##",
+    "△": "M",
+    "Δ": "M",
+    "maj": "M",
+    "Maj": "M",
+    "min": "m",
+    "-": "m",
+    "ø": "h",
+    "°": "dim",
+    "o": "dim",
+    "no": "no",
+    "aug": "+",
+}
+
+# Chord label names, and other names for them once their tokens are replaced
+_name_aliases = {
+    "": ("M",),
+    "h7": ("h", "m7b5", "m7(b5)"),
+    "mM7": ("m(M7)",),
+    "+7": ("7#5", "7(#5)"),
+    "b9": ("7b9", "7(b9)"),
+    "#9": ("7#9", "7(#9)"),
+    "sus4": ("sus",),
+    "7sus4": ("7sus",),
+    "(add9)": ("add9",),
+    "m(add9)": ("madd9",),
+    "6(add9)": ("69", "6/9"),
+}
+
+
+class ChordSymbol(
+    namedtuple("ChordSymbol", ["root", "chord_label", "bass"], defaults=[None])
+):
+    def pitch_classes(self) -> Bitmap:
+        # 12-bit bitmap of the pitch classes the chord sounds, in semitones above A
+        bitmap = rotate_pitch_classes(
+            self.chord_label.semitone_bitmap.pitch_classes(), self.root.semitone
+        )
+        if self.bass is not None:
+            bitmap |= 1 << self.bass.semitone
+        return bitmap
+
+    def __str__(self):
+        bass = "" if self.bass is None else "/" + self.bass.name
+        return self.root.name + self.chord_label.name + bass
+
+
+_valid_notes_names = set(valid_notes_names)
+
+
+class ChordSymbolParser:
+    def __init__(self, chord_label_index: ChordLabelIndex):
+        # Trie of the alias tokens, one character per level. The token an alias is replaced
+        # with is at the key "" of the node the alias ends at.
+        self._tokens: dict = dict()
+        for alias, token in _token_aliases.items():
+            node = self._tokens
+            for c in alias:
+                node = node.setdefault(c, dict())
+            node[""] = token
+
+        self._by_name: dict[str, ChordLabel] = {
+            cl.name: cl for cl in chord_label_index.values()
+        }
+        for name, aliases in _name_aliases.items():
+            cl = chord_label_index.by_name(name)
+            if cl is not None:
+                for a in aliases:
+                    # Chord label names take precedence over aliases
+                    self._by_name.setdefault(a, cl)
+
+    def normalize(self, s: str) -> str:
+        # Replace each alias token, taking the longest one at each position, in one scan
+        tokens = list()
+        i = 0
+        while i < len(s):
+            node = self._tokens
+            (token, end) = (s[i], i + 1)
+            j = i
+            while j < len(s) and s[j] in node:
+                node = node[s[j]]
+                j += 1
+                if "" in node:
+                    (token, end) = (node[""], j)
+            tokens.append(token)
+            i = end
+        return "".join(tokens)
+
+    def parse(self, symbol: str) -> ChordSymbol | None:
+        # The chord symbol, or None if it isn't one
+        s = self.normalize(symbol.strip())
+
+        # A slash is only a bass note if a note name follows it, so 6/9 is a chord label name
+        bass = None
+        (head, slash, tail) = s.rpartition("/")
+        if slash and tail in _valid_notes_names:
+            (s, bass) = (head, Note(tail))
+
+        # The longest root note name is tried first, so Bb9 is a Bb 9 chord, not a B b9 chord
+        for length in (3, 2, 1):
+            root_name = s[:length]
+            if root_name not in _valid_notes_names:
+                continue
+            chord_label = self._by_name.get(s[length:])
+            if chord_label is not None:
+                return ChordSymbol(Note(root_name), chord_label, bass)
+        return None
+
+
+chord_symbol_parser: ChordSymbolParser
+
+
+def _build_chord_symbol_parser() -> ChordSymbolParser:
+    from chord_label import chord_label_index
+
+    return ChordSymbolParser(chord_label_index)
+
+
+__getattr__ = module_getattr(
+    __name__, {"chord_symbol_parser": _build_chord_symbol_parser}
+)
+
+
+@lru_cache(maxsize=65536)
+def parse_chord_symbol(symbol: str) -> ChordSymbol | None:
+    from chord_symbol import chord_symbol_parser
+
+    return chord_symbol_parser.parse(symbol)
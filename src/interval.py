@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from bisect import bisect_right
 from prettify import prettify
 from typing import Iterable, Self
 
@@ -25,18 +25,49 @@ _major_scale_degree_semitones = {
     7: 11,
 }
 
+# Major scale degrees that are only a semitone above the degree below them, i.e. 3 -> 4 and
+# 7 -> 8, and again an octave up. bisect_right(_semitone_step_degrees, d) is the number of
+# semitone steps passed when walking up from degree 1 to degree d.
+_semitone_step_degrees = (4, 8, 11, 15)
+
+
+# Interned instances, one per (major_scale_degree, rel_semitones)
+_interned: dict[tuple[int, int], "Interval"] = dict()
+
 
-@dataclass
 class Interval:
+    __slots__ = (
+        "major_scale_degree",
+        "rel_semitones",
+        "semitones",
+        "name",
+        "pretty",
+        "_hash",
+        "_normalized",
+    )
+
     major_scale_degree: int
     rel_semitones: int
+    semitones: int
+    name: str
+    pretty: str
+    _hash: int
+    _normalized: tuple["Interval", int] | None
+
+    def __new__(cls, major_scale_degree: int, rel_semitones: int):
+        # Intervals are immutable values, so every distinct interval is only ever built once,
+        # and equality between intervals is just identity.
+        key = (major_scale_degree, rel_semitones)
+        self = _interned.get(key)
+        if self is not None:
+            return self
 
-    def __init__(self, major_scale_degree: int, rel_semitones: int):
         # if major_scale_degree < 1 or major_scale_degree > 11:
         #    raise ValueError(
         #        f"Major scale degree {major_scale_degree} is not currently supported."
         #    )
 
+        self = super().__new__(cls)
         self.major_scale_degree = major_scale_degree
         self.rel_semitones = rel_semitones
         self.semitones = _total_semitones(major_scale_degree) + rel_semitones
@@ -45,18 +76,21 @@ class Interval:
             "b" * (-rel_semitones) if rel_semitones < 0 else "#" * rel_semitones
         ) + str(major_scale_degree)
         self.pretty = prettify(self.name)
+        self._hash = hash(key)
+        self._normalized = None
 
-    def __eq__(self, other: Self) -> bool:
-        return (
-            self.major_scale_degree == other.major_scale_degree
-            and self.rel_semitones == other.rel_semitones
-        )
+        _interned[key] = self
+        return self
+
+    def __reduce__(self):
+        # Unpickling goes back through __new__, so it returns the interned instance
+        return (Interval, (self.major_scale_degree, self.rel_semitones))
 
     def enharmonic_equals(self, other: Self) -> bool:
         return self.semitones == other.semitones
 
     def __hash__(self):
-        return hash((self.major_scale_degree, self.rel_semitones))
+        return self._hash
 
     def __repr__(self):
         return self.pretty
@@ -69,10 +103,10 @@ class Interval:
             return self.name < other.name
 
     def __sub__(self, other: Self) -> Self:
-        # walk from 'other' up to 'self'
-        rel_major_scale_degrees = 1
-        rel_semitones = 0
-
+        # Walking from 'other' up to 'self' one major scale degree at a time, every semitone
+        # step we pass along the way is one semitone less than the corresponding step
+        # counted from 1, and every semitone step counted from 1 is one semitone more.
+        #
         # Suppose we start from other = (2, 0), self = (7, 0)
         # current = (2, 0) -> diff = (1, 0)
         # current = (3, 0) -> diff = (2, 0)
@@ -80,29 +114,24 @@ class Interval:
         # current = (5, 0) -> diff = (4, 0)
         # current = (6, 0) -> diff = (5, 0)
         # current = (7, 0) -> diff = (6, 0)
-        for curr_major_scale_degree in range(
-            other.major_scale_degree + 1, self.major_scale_degree + 1
-        ):
-            # print(
-            #     f"{other} - {self}: currently at major scale degree {curr_major_scale_degree}, diff so far is {rel_major_scale_degrees},{rel_semitones}"
-            # )
-
-            rel_major_scale_degrees += 1
-            if curr_major_scale_degree in (4, 8, 11, 15):
-                rel_semitones -= 1
-            if rel_major_scale_degrees in (4, 8, 11, 15):
-                rel_semitones += 1
-
-        rel_semitones += self.rel_semitones
-        rel_semitones -= other.rel_semitones
-
-        # print(
-        #     f"{other} - {self}: after final adjustment, diff is {rel_major_scale_degrees},{rel_semitones}"
-        # )
+        span = self.major_scale_degree - other.major_scale_degree
+        if span < 0:
+            span = 0
+
+        return Interval(
+            span + 1,
+            bisect_right(_semitone_step_degrees, span + 1)
+            - bisect_right(_semitone_step_degrees, other.major_scale_degree + span)
+            + bisect_right(_semitone_step_degrees, other.major_scale_degree)
+            + self.rel_semitones
+            - other.rel_semitones,
+        )
 
+    def __add__(self, other: Self) -> "Interval":
+        major_scale_degree = self.major_scale_degree + other.major_scale_degree - 1
         return Interval(
-            rel_major_scale_degrees,
-            rel_semitones,
+            major_scale_degree,
+            self.semitones + other.semitones - _total_semitones(major_scale_degree),
         )
 
     def up_octave(self) -> Self:
@@ -114,18 +143,25 @@ class Interval:
     def normalize_octave(self) -> Self:
         return self.normalize_octave_ex()[0]
 
-    def normalize_octave_ex(self) -> tuple[Self, int]:
+    def normalize_octave_ex(self) -> tuple["Interval", int]:
+        if self._normalized is not None:
+            return self._normalized
+
         x_major_scale_degrees = self.major_scale_degree
         x_rel_octave = 0
 
-        while x_major_scale_degrees >= 8:
-            x_rel_octave += 1
-            x_major_scale_degrees -= 7
-        while x_major_scale_degrees < 0:
-            x_rel_octave -= 1
-            x_major_scale_degrees += 7
+        if x_major_scale_degrees >= 8:
+            x_rel_octave = (x_major_scale_degrees - 1) // 7
+            x_major_scale_degrees -= 7 * x_rel_octave
+        elif x_major_scale_degrees < 0:
+            x_rel_octave = x_major_scale_degrees // 7
+            x_major_scale_degrees -= 7 * x_rel_octave
 
-        return (Interval(x_major_scale_degrees, self.rel_semitones), x_rel_octave)
+        self._normalized = (
+            Interval(x_major_scale_degrees, self.rel_semitones),
+            x_rel_octave,
+        )
+        return self._normalized
 
 
 _values: list[Interval] = [
@@ -154,19 +190,38 @@ _values: list[Interval] = [
     Interval(11, 1),
 ]
 
+# Intervals that only the extended chord labels (see chord_label.py) have. They have bits in
+# keys, after those of the values, but aren't values, so they aren't in the data files.
+_key_only_values: list[Interval] = [
+    Interval(13, -1),
+    Interval(13, 0),
+]
+
 
 ### Index
 class IntervalIndex:
-    def __init__(self, values: Iterable[Interval]):
+    def __init__(
+        self, values: Iterable[Interval], key_only_values: Iterable[Interval] = ()
+    ):
         self.values = list(values)
         self._by_name: dict[str, Interval] = dict()
-        for v in values:
+        self._positions: dict[Interval, int] = dict()
+        for x, v in enumerate(self.values):
             if v.name in self._by_name.keys():
                 raise KeyError(v.name)
             self._by_name[v.name] = v
+            self._positions[v] = x
+        # The bit of each interval in keys
+        self._key_bits = {
+            v: 1 << x for x, v in enumerate([*self.values, *key_only_values])
+        }
+
+        # Differences between every pair of intervals, by position:
+        # _diffs[x][y] == values[y] - values[x]
+        self._diffs = [[i2 - i1 for i2 in self.values] for i1 in self.values]
 
     def __repr__(self):
-        return self.values().__repr__()
+        return self.values.__repr__()
 
     def get(self, x) -> Interval:
         if isinstance(x, str):
@@ -176,5 +231,23 @@ class IntervalIndex:
         else:
             raise TypeError(type(x))
 
+    def position(self, i: Interval) -> int:
+        return self._positions[i]
+
+    def key(self, intervals: Iterable[Interval]) -> int | None:
+        # A set of intervals packed into an int, with a bit for each interval's position in the
+        # values and then the key only values, or None if an interval isn't in either or is
+        # repeated
+        key = 0
+        for i in intervals:
+            bit = self._key_bits.get(i)
+            if bit is None or key & bit:
+                return None
+            key |= bit
+        return key
+
+    def diff(self, x: int, y: int) -> Interval:
+        return self._diffs[x][y]
+
 
-interval_index = IntervalIndex(_values)
+interval_index = IntervalIndex(_values, _key_only_values)
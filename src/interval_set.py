@@ -4,6 +4,12 @@ from typing import Iterable, NewType, Self
 Bitmap = NewType("Bitmap", int)
 
 
+def rotate_pitch_classes(bitmap: int, i: int) -> Bitmap:
+    # Transpose a 12-bit pitch class bitmap up by i semitones, wrapping around the octave
+    i %= 12
+    return Bitmap(((bitmap << i) | (bitmap >> (12 - i))) & 0xFFF)
+
+
 class SemitoneSet:
     def __init__(self, semitones: Iterable[int]):
         self.bitmap = 0
@@ -26,6 +32,15 @@ class SemitoneSet:
         copy.bitmap = (self.bitmap & 0xFFF) | (self.bitmap >> 12)
         return copy
 
+    def pitch_classes(self) -> Bitmap:
+        # Fold every octave down onto a single 12-bit bitmap
+        bitmap = self.bitmap
+        pitch_classes = 0
+        while bitmap:
+            pitch_classes |= bitmap & 0xFFF
+            bitmap >>= 12
+        return Bitmap(pitch_classes)
+
     def contains_set(self, b2):
         return self.bitmap & b2.bitmap == b2.bitmap
 
@@ -37,12 +52,14 @@ class IntervalSet:
     def __init__(self, intervals: Iterable[str | Interval]):
         self.intervals = tuple(sorted(map(interval_index.get, intervals)))
         self.semitone_bitmap = SemitoneSet([i.semitones for i in self.intervals])
+        # See IntervalIndex.key
+        self.key = interval_index.key(self.intervals)
 
     def contains_enharmonics(self, other: int | Self) -> bool:
         other_bitmap = other.semitones if isinstance(other, Interval) else other
         return self.semitone_bitmap.contains_set(other_bitmap)
 
-    def relative_to(self, new_root: str | Interval) -> Iterable[Interval]:
+    def relative_to(self, new_root: str | Interval) -> "IntervalSet":
         new_root = interval_index.get(new_root).normalize_octave()
 
         result = list()
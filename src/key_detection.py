@@ -0,0 +1,102 @@
+from lazy import module_getattr
+from note import Note
+from scale import Scale, ScaleIndex
+from typing import Iterable
+import numpy as np
+
+# Detecting the key, i.e. the scales that fit a bag of notes best.
+#
+# Bags of notes are vectors of counts (or any weights) of each pitch class, and are scored
+# against every scale at once, as a matrix product with a matrix of which pitch classes each
+# scale has. Many bags can be scored at once, one per row.
+#
+# A scale's score is the weight of the notes in it, less outside_penalty times the weight of
+# the notes outside it, plus root_bonus times the weight of its root note, plus tonic_bonus if
+# its root is the bag's tonic, if one is given. Ties go to the scale first in the scale index.
+
+
+def pitch_class_counts(notes: Iterable[str | Note]) -> np.ndarray:
+    return np.bincount(
+        [(n if isinstance(n, Note) else Note(n)).semitone for n in notes], minlength=12
+    ).astype(np.float64)
+
+
+def bitmap_counts(bitmaps: int | Iterable[int]) -> np.ndarray:
+    # Counts of 1 for each pitch class in a 12-bit bitmap, or in each of an array of them
+    return ((np.asarray(bitmaps)[..., np.newaxis] >> np.arange(12)) & 1).astype(
+        np.float64
+    )
+
+
+class KeyDetector:
+    def __init__(
+        self,
+        scale_index: ScaleIndex,
+        outside_penalty: float = 1.0,
+        root_bonus: float = 0.25,
+        tonic_bonus: float = 0.5,
+    ):
+        self.scales: list[Scale] = list(scale_index.values())
+        roots = bitmap_counts([1 << s.root.semitone for s in self.scales])
+
+        # Every term of the score is a weight per scale, of a pitch class or of a bag's tonic,
+        # so a bag's scores are one product of its counts and its tonic, with rows of weights.
+        # The weight of a note in a scale is 1, and outside it is -outside_penalty, plus
+        # root_bonus for the root. The weight of a tonic is tonic_bonus for scales rooted on
+        # it, and the last row, for bags without a tonic, is zeros.
+        membership = bitmap_counts([s.pitch_class_bitmap for s in self.scales])
+        self._weights = np.vstack(
+            [
+                (1 + outside_penalty) * membership.T
+                - outside_penalty
+                + root_bonus * roots.T,
+                tonic_bonus * roots.T,
+                np.zeros(len(self.scales)),
+            ]
+        )
+        self._tonics = np.eye(13)
+
+    def scores(
+        self, counts: np.ndarray, tonics: Iterable[int | None] | None = None
+    ) -> np.ndarray:
+        # Bags by scales, from bags by pitch classes, or a single bag as a row.
+        # Tonics are pitch classes, one per bag, or None for a bag without one.
+        counts = np.atleast_2d(np.asarray(counts, np.float64))
+        rows = (
+            np.full(len(counts), 12)
+            if tonics is None
+            else np.array([12 if t is None else t for t in tonics])
+        )
+        return np.hstack([counts, self._tonics[rows]]) @ self._weights
+
+    def best(
+        self, counts: np.ndarray, tonics: Iterable[int | None] | None = None
+    ) -> list[Scale]:
+        # The best scale for each bag
+        best = np.argmax(self.scores(counts, tonics), axis=1)
+        return [self.scales[x] for x in best]
+
+    def top(
+        self, counts: np.ndarray, k: int = 5, tonic: int | None = None
+    ) -> list[tuple[Scale, float]]:
+        # The k best scales for a bag, best first, with their scores
+        scores = self.scores(counts, None if tonic is None else [tonic])[0]
+        k = min(k, len(scores))
+        # The k best in any order, then sorted, with ties in scale index order
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        threshold = scores[candidates].min()
+        candidates = np.flatnonzero(scores >= threshold)
+        order = candidates[np.argsort(-scores[candidates], kind="stable")][:k]
+        return [(self.scales[x], float(scores[x])) for x in order]
+
+
+key_detector: KeyDetector
+
+
+def _build_key_detector() -> KeyDetector:
+    from scale import scale_index
+
+    return KeyDetector(scale_index)
+
+
+__getattr__ = module_getattr(__name__, {"key_detector": _build_key_detector})
@@ -0,0 +1,91 @@
+from manifest import fingerprint
+from typing import Any, Callable
+import os
+import pickle
+import sys
+
+# Module level indexes, that are built on first use rather than on import, and optionally
+# snapshotted to disk, so that later processes can load them rather than build them again.
+#
+# Snapshots are pickles, named by the module and index, and by a hash of the source they were
+# built from, so any change to the definitions makes the existing snapshots stale. Only point
+# cache_dir at a directory you trust, since loading a pickle can run arbitrary code.
+
+# Directory that snapshots are read from and written to, or None to always build the indexes
+cache_dir: str | None = os.environ.get("HARMONY_CACHE_DIR") or None
+
+_definitions_hash: str | None = None
+
+
+def definitions_hash() -> str:
+    # Hash of every module alongside this one, and of the Python version that pickled them
+    global _definitions_hash
+    if _definitions_hash is None:
+        src_dir = os.path.dirname(os.path.abspath(__file__))
+        sources = list()
+        for name in sorted(os.listdir(src_dir)):
+            if name.endswith(".py"):
+                with open(os.path.join(src_dir, name), encoding="utf8") as f:
+                    sources.append((name, f.read()))
+        _definitions_hash = fingerprint(tuple(sys.version_info[:2]), sources)
+    return _definitions_hash
+
+
+def load_or_build(name: str, build: Callable[[], Any]) -> Any:
+    if cache_dir is None:
+        return build()
+
+    prefix = f"{name}-"
+    path = os.path.join(cache_dir, f"{prefix}{definitions_hash()}.pickle")
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        # A snapshot that can't be loaded, for whatever reason, is just built again and replaced
+        pass
+
+    value = build()
+    # The cache is optional, so a snapshot that can't be written is just not written
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(temp_path, "wb") as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return value
+
+    # Remove the stale snapshots of this index, which other processes may be removing too
+    for file in os.listdir(cache_dir):
+        if (
+            file.startswith(prefix)
+            and file.endswith(".pickle")
+            and file != os.path.basename(path)
+        ):
+            try:
+                os.remove(os.path.join(cache_dir, file))
+            except FileNotFoundError:
+                pass
+    return value
+
+
+def module_getattr(
+    module_name: str, builders: dict[str, Callable[[], Any]]
+) -> Callable[[str], Any]:
+    # A module __getattr__ (see PEP 562) that builds each of the module's indexes on first use,
+    # and then sets it on the module, so it's only built once.
+    # Builders that need another of the module's indexes should import it, e.g.
+    # "from relationship import relationships", so that it is built too.
+    def __getattr__(name: str) -> Any:
+        build = builders.get(name)
+        if build is None:
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+        value = load_or_build(f"{module_name}.{name}", build)
+        setattr(sys.modules[module_name], name, value)
+        return value
+
+    return __getattr__
@@ -0,0 +1,195 @@
+from note import root_note_names
+from scale_label import scale_label_index
+from typing import Iterator
+from urllib.parse import urlencode
+import asyncio
+import click
+import itertools
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+# Load test of the query service (see service.py): concurrent keep-alive connections, each
+# sending a mix of queries one after another, with the latency of each one measured from the
+# client. For example, against a service started by the load test itself:
+#   python src/load_test.py --spawn --requests 50000 --connections 16
+# The client shares the machine with the service, so on one core the latencies include time
+# the service spends waiting for the client.
+
+
+def _queries(seed: int) -> Iterator[str]:
+    # An endless mix of queries, with repeats, as a front end would send
+    rng = random.Random(seed)
+    scale_labels = [sl.name for sl in scale_label_index.values()]
+    chord_labels = ["", "m", "7", "m7", "M7", "h7", "dim7", "9", "sus4", "6"]
+    while True:
+        root = rng.choice(root_note_names)
+        kind = rng.randrange(5)
+        if kind == 0:
+            notes = rng.sample(root_note_names, rng.randint(2, 5))
+            params = {"notes": ",".join(notes)}
+            path = "/identify"
+        elif kind == 1:
+            params = {"root": root, "scale_label": rng.choice(scale_labels)}
+            path = "/scale"
+        elif kind == 2:
+            params = {"root": root, "scale_label": rng.choice(scale_labels)}
+            path = "/chords_in_scale"
+        elif kind == 3:
+            params = {"chord_label": rng.choice(chord_labels)}
+            path = "/neighbors"
+        else:
+            params = {
+                "symbol": root + rng.choice(chord_labels),
+                "interval": rng.choice(["2", "b3", "4", "5", "b7"]),
+            }
+            path = "/transpose"
+        yield f"{path}?{urlencode(params)}"
+
+
+async def _connection(
+    host: str, port: int, queries: Iterator[str], count: int, latencies: list[float]
+) -> dict[int, int]:
+    (reader, writer) = await asyncio.open_connection(host, port)
+    statuses: dict[int, int] = dict()
+    for target in itertools.islice(queries, count):
+        start = time.perf_counter()
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin1"))
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while (line := await reader.readline()) != b"\r\n":
+            (name, _, value) = line.decode("latin1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+    writer.close()
+    return statuses
+
+
+async def _run(
+    host: str, port: int, requests: int, connections: int, seed: int
+) -> tuple[list[float], dict[int, int], float]:
+    latencies: list[float] = list()
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *[
+            _connection(
+                host,
+                port,
+                _queries(seed + c),
+                requests // connections + (c < requests % connections),
+                latencies,
+            )
+            for c in range(connections)
+        ]
+    )
+    elapsed = time.perf_counter() - start
+    statuses: dict[int, int] = dict()
+    for r in results:
+        for status, n in r.items():
+            statuses[status] = statuses.get(status, 0) + n
+    return (latencies, statuses, elapsed)
+
+
+def _percentile(sorted_values: list[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def _spawn(host: str, port: int) -> subprocess.Popen:
+    # Start the service, and wait until it's listening
+    program = os.path.join(os.path.dirname(os.path.abspath(__file__)), "program.py")
+    process = subprocess.Popen(
+        [sys.executable, program, "serve", "--host", host, "--port", str(port)],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    assert process.stderr is not None
+    line = process.stderr.readline()
+    if not line.startswith("Serving"):
+        process.kill()
+        raise click.ClickException(f"The service didn't start: {line}")
+    # Keep passing on what the service logs, so that it can't fill the pipe and stall the
+    # service in the middle of the measurements
+    threading.Thread(
+        target=shutil.copyfileobj, args=(process.stderr, sys.stderr), daemon=True
+    ).start()
+    return process
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8000, show_default=True, type=click.IntRange(0, 65535))
+@click.option(
+    "--spawn",
+    is_flag=True,
+    help="Start the service on --host and --port, and stop it afterwards.",
+)
+@click.option(
+    "--requests",
+    default=20000,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of requests to send.",
+)
+@click.option(
+    "--connections",
+    default=8,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of concurrent connections.",
+)
+@click.option(
+    "--warmup",
+    default=2000,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Number of requests to send before measuring.",
+)
+@click.option("--seed", default=0, show_default=True, help="Seed of the query mix.")
+def cli(
+    host: str,
+    port: int,
+    spawn: bool,
+    requests: int,
+    connections: int,
+    warmup: int,
+    seed: int,
+):
+    """Measure the query service's throughput and latency.
+
+    Exits with status 1 if any request didn't succeed.
+    """
+    process = _spawn(host, port) if spawn else None
+    try:
+        if warmup:
+            asyncio.run(_run(host, port, warmup, connections, seed))
+        (latencies, statuses, elapsed) = asyncio.run(
+            _run(host, port, requests, connections, seed + connections)
+        )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    latencies.sort()
+    click.echo(f"{len(latencies)} requests in {elapsed:.2f}s")
+    click.echo(f"{len(latencies) / elapsed:.0f} requests/s")
+    for name, p in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0)):
+        click.echo(f"{name:4} {_percentile(latencies, p) * 1e3:8.3f}ms")
+    click.echo(
+        "statuses " + ", ".join(f"{s}: {n}" for (s, n) in sorted(statuses.items()))
+    )
+    failed = sum(n for (s, n) in statuses.items() if s != 200)
+    if failed:
+        click.echo(f"{failed} requests didn't succeed", err=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
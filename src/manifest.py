@@ -0,0 +1,44 @@
+import hashlib
+import json
+import os
+
+
+def fingerprint(*values) -> str:
+    # Hash of the repr of some plain values (strings, numbers, lists, tuples)
+    return hashlib.sha256(repr(values).encode("utf8")).hexdigest()[:16]
+
+
+class Manifest:
+    # Records, for each generated file, the hashes of the inputs it was generated from, so that
+    # files whose inputs haven't changed don't need to be generated again.
+    def __init__(self, path: str):
+        self.path = path
+        self._inputs: dict[str, dict[str, str]] = dict()
+        if os.path.exists(path):
+            with open(path, encoding="utf8") as f:
+                self._inputs = json.load(f)["files"]
+
+    def stale_reason(self, file: str, inputs: dict[str, str]) -> str | None:
+        # Why the file needs to be generated again, or None if it is up to date
+        if not os.path.exists(os.path.join(os.path.dirname(self.path), file)):
+            return "missing"
+        recorded = self._inputs.get(file)
+        if recorded is None:
+            return "not in manifest"
+        changed = [k for k in inputs.keys() if recorded.get(k) != inputs[k]]
+        changed += [k for k in recorded.keys() if k not in inputs]
+        if changed:
+            return ", ".join(changed) + " changed"
+        return None
+
+    def record(self, file: str, inputs: dict[str, str]):
+        self._inputs[file] = dict(inputs)
+
+    def save(self):
+        # Written to a temporary file and then moved over the manifest, so that other processes
+        # generating data files at the same time never read a partly written one
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf8") as f:
+            json.dump({"files": self._inputs}, f, indent=1, sort_keys=True)
+            print(file=f)
+        os.replace(temp_path, self.path)
@@ -1,4 +1,3 @@
-from dataclasses import dataclass
 from interval import Interval
 from prettify import prettify
 from typing import Iterable, Self
@@ -33,7 +32,7 @@ _semitone_note_names = {
     11: ["G#", "Ab"],
 }
 
-# _note_name_semitones = {n: s for (s, nn) in _semitone_note_names for n in nn}
+_note_name_semitones = {n: s for (s, nn) in _semitone_note_names.items() for n in nn}
 _note_name_enharmonics = {n: nn for nn in _semitone_note_names.values() for n in nn}
 
 _rel_note_names = {
@@ -68,26 +67,65 @@ valid_notes_names = [x for xx in _semitone_note_names.values() for x in xx]
 # are considered abominations are are completel not allowed
 
 
-@dataclass
+# Interned instances, one per (name, rel_octave)
+_interned: dict[tuple[str, int], "Note"] = dict()
+
+
 class Note:
+    __slots__ = ("name", "rel_octave", "semitone", "_repr", "_hash", "_sums")
+
     name: str
-    rel_octave: int = 0
+    rel_octave: int
+    # Pitch class, in semitones above A
+    semitone: int
+    _repr: str
+    _hash: int
+    # Results of add(), by interval
+    _sums: dict[Interval, "Note"]
+
+    def __new__(cls, name: str, rel_octave: int = 0):
+        # Notes are immutable values, so every distinct note is only ever built once,
+        # and equality between notes is just identity.
+        key = (name, rel_octave)
+        self = _interned.get(key)
+        if self is not None:
+            return self
 
-    def __init__(self, name: str, rel_octave: int = 0):
         if name not in valid_notes_names:
             raise ValueError(f"Invalid note name {name}")
 
+        self = super().__new__(cls)
         self.name = name
         self.rel_octave = rel_octave
+        self.semitone = _note_name_semitones[name]
+        self._repr = prettify(name) + (
+            "↑" * rel_octave
+            if rel_octave > 0
+            else "↓" * (-1 * rel_octave) if rel_octave < 0 else ""
+        )
+        self._hash = hash(key)
+        self._sums = dict()
+
+        _interned[key] = self
+        return self
+
+    def __reduce__(self):
+        # Unpickling goes back through __new__, so it returns the interned instance
+        return (Note, (self.name, self.rel_octave))
+
+    def __hash__(self):
+        return self._hash
 
     def __repr__(self):
-        return prettify(self.name) + (
-            "↑" * self.rel_octave
-            if self.rel_octave > 0
-            else "↓" * (-1 * self.rel_octave) if self.rel_octave < 0 else ""
-        )
+        return self._repr
 
     def add(self, i: Interval):
+        x = self._sums.get(i)
+        if x is None:
+            x = self._sums[i] = self._add(i)
+        return x
+
+    def _add(self, i: Interval):
         # Don't support generating intervals from double flats or double sharps etc
         if self.name not in root_note_names:
             raise ValueError(
@@ -0,0 +1,112 @@
+from contextlib import contextmanager
+from typing import Callable, Iterator
+import cProfile
+import json
+import os
+import pstats
+import time
+import tracemalloc
+
+# Per-stage instrumentation of data file generation: wall time, the number of calls to some
+# hot functions, and memory allocated, from tracemalloc.
+#
+# Timings include the overhead of cProfile and tracemalloc, so they're only comparable with
+# other profiled runs. Only this process is profiled, so chords written by worker processes
+# aren't counted.
+
+
+def _hot_functions() -> dict[str, Callable]:
+    from chord_label import ChordLabel
+    from chord_scale_engine import ChordScaleEngine
+    from interval import Interval
+    from interval_set import IntervalSet
+    from note import Note
+    from scale import Scale
+
+    return {
+        "Interval.__new__": Interval.__new__,
+        "Interval.__sub__": Interval.__sub__,
+        "Note.__new__": Note.__new__,
+        "Note.add": Note.add,
+        "Note._add": Note._add,
+        "Scale.__init__": Scale.__init__,
+        "IntervalSet.__init__": IntervalSet.__init__,
+        "ChordLabel.extend_with": ChordLabel.extend_with,
+        # cProfile counts each resumption of a generator as a call, so this is the number
+        # of chords yielded, plus one per scale
+        "ChordScaleEngine.chords_in_scale (yields)": ChordScaleEngine.chords_in_scale,
+    }
+
+
+class Profiler:
+    def __init__(self, pstats_dir: str | None = None):
+        # Directory to write a pstats file for each stage to, if any
+        self.pstats_dir = pstats_dir
+        self.stages: list[dict] = list()
+        # The pstats key of each hot function, i.e. (file name, line number, function name)
+        self._hot_keys = {
+            name: (f.__code__.co_filename, f.__code__.co_firstlineno, f.__name__)
+            for (name, f) in _hot_functions().items()
+        }
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        (start_memory, _) = tracemalloc.get_traced_memory()
+
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            wall = time.perf_counter() - start
+            (memory, peak_memory) = tracemalloc.get_traced_memory()
+
+            stats = pstats.Stats(profile)
+            # Stats.stats isn't in the type stubs, but is documented
+            by_key = stats.stats  # type: ignore[attr-defined]
+            calls = {
+                n: by_key[k][1] if k in by_key else 0
+                for (n, k) in self._hot_keys.items()
+            }
+            if self.pstats_dir is not None:
+                os.makedirs(self.pstats_dir, exist_ok=True)
+                stats.dump_stats(os.path.join(self.pstats_dir, f"{name}.pstats"))
+
+            self.stages.append(
+                {
+                    "name": name,
+                    "wall_seconds": wall,
+                    "calls": calls,
+                    # Memory still allocated at the end of the stage, such as built indexes
+                    "retained_bytes": memory - start_memory,
+                    # Most memory allocated at once during the stage
+                    "peak_bytes": peak_memory - start_memory,
+                }
+            )
+
+    def report(self) -> dict:
+        return {
+            "total_wall_seconds": sum(s["wall_seconds"] for s in self.stages),
+            "stages": self.stages,
+        }
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf8") as f:
+            json.dump(self.report(), f, indent=1)
+            print(file=f)
+
+    def summary(self) -> str:
+        lines = [f"{'Stage':32} {'Wall':>10} {'Peak':>10} {'Retained':>10}  Calls"]
+        for s in self.stages:
+            calls = ", ".join(f"{n} {c}" for (n, c) in s["calls"].items() if c)
+            lines.append(
+                f"{s['name']:32} {s['wall_seconds'] * 1e3:8.1f}ms"
+                f" {s['peak_bytes'] / 1024:8.0f}KB {s['retained_bytes'] / 1024:8.0f}KB"
+                f"  {calls}"
+            )
+        return "\n".join(lines)
@@ -1,64 +1,100 @@
-from chord import Chord
-from chord_label import ChordLabel, ChordLabelIndex, chord_label_index
-from interval import Interval, interval_index
-from note import Note, root_notes, valid_notes_names
-from prettify import prettify
-from relationship import relationships
+from chord_label import ChordLabelIndex
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from functools import cache
+from interval import interval_index
+from manifest import Manifest, fingerprint
+from note import Note, root_note_names, root_notes, valid_notes_names
+from profiling import Profiler
 from scale_label import ScaleLabel, scale_label_index
-from scale import Scale
+from sinks import Sink, TextSink, sinks
+from typing import Callable, Iterable
+import click
+import inspect
+import lazy
+import math
 import os
+import records
+import sys
 
-try:
-    os.mkdir("data")
-except FileExistsError:
-    pass
+# Bump this to regenerate every data file, such as when what they're written from changes
+# outside the modules below
+generator_version = 2
+
+# Modules whose code determines what is written to the data files, alongside this one
+_generating_modules = (
+    "program",
+    "records",
+    "sinks",
+    "prettify",
+    "note",
+    "interval",
+    "interval_set",
+    "scale",
+    "scale_label",
+    "chord_label",
+    "chord_scale_engine",
+    "chord_db",
+)
+
+# Directory that all data files are written to
+data_dir = "data"
+
+# How data files are written
+sink_type: type[Sink] = TextSink
+
+# Manifest of the inputs that each data file in data_dir was generated from
+manifest: Manifest | None = None
+
+# Whether to write data files even if their inputs haven't changed
+force = False
+
+# Data files that were skipped because their inputs haven't changed
+up_to_date: list[str] = list()
+
+# Instrumentation of each stage of generation, when profiling
+profiler: Profiler | None = None
+
+
+def _stage(name: str):
+    return profiler.stage(name) if profiler is not None else nullcontext()
 
 
 def open_data_write(filename: str):
-    return open(f"data/{filename}", "w", encoding="utf8")
-
-
-# Write intervals
-with open_data_write("intervals.txt") as f:
-    for i in interval_index.values:
-        print(f"{i} ({i.semitones} total semitones)", file=f)
-
-# Write differences between intervals
-with open_data_write("interval_diffs.txt") as f:
-    for x in range(len(interval_index.values)):
-        i1 = interval_index.values[x]
-        for y in range(x, len(interval_index.values)):
-            i2 = interval_index.values[y]
-            print(
-                f"{i1} to {i2} is a {i2 - i1}",
-                file=f,
-            )
+    os.makedirs(data_dir, exist_ok=True)
+    return open(os.path.join(data_dir, filename), "w", encoding="utf8")
+
+
+def data_file_name(name: str) -> str:
+    return f"{name}.{sink_type.extension}"
+
 
+def write_records(name: str, records: Iterable):
+    with open_data_write(data_file_name(name)) as f:
+        sink_type(f).write(records)
 
-# Write all notes and intervals between them
-with open_data_write("note_intervals.txt") as f:
-    for r in root_notes:
-        for i in interval_index.values:
-            n2 = r.add(i)
-            print(f"{r} interval {i} = {n2}", file=f)
-
-# Write all scales's notes
-with open_data_write("scale_notes.txt") as f:
-    for r in root_notes:
-        for sl in scale_label_index.values():
-            sl = sl.extended()
-            s = Scale(r, sl)
-            print(s, file=f)
-
-# Write each note which scales it (or its enharmonics) is in
-with open_data_write("note_enharmonic_scales.txt") as f:
-    for n in valid_notes_names:
-        scales = [
-            Scale(r, sl.extended())
-            for r in root_notes
-            for sl in scale_label_index.values()
-        ]
-        print(n, [s.name for s in scales if s.contains_note_or_enharmonic(n)], file=f)
+
+def _relationship_records() -> Iterable:
+    from relationship import relationships
+
+    click.echo(
+        f"{len(relationships)} relationships, "
+        f"{relationships.duplicates} duplicates suppressed",
+        err=True,
+    )
+    return records.relationship_records()
+
+
+# The record generators for each data file, other than the chords
+_data_files: dict[str, Callable[[], Iterable]] = {
+    "intervals": records.interval_records,
+    "interval_diffs": records.interval_diff_records,
+    "note_intervals": records.note_interval_records,
+    "scale_notes": records.scale_records,
+    "note_enharmonic_scales": records.note_scale_records,
+    "relationships": _relationship_records,
+    "scale_label_relative_intervals": records.scale_label_relative_interval_records,
+}
 
 
 def dump_chord_labels(cli: ChordLabelIndex, file: str):
@@ -70,70 +106,640 @@ def dump_chord_labels(cli: ChordLabelIndex, file: str):
             print(cli.by_intervals(i), file=f)
 
 
-def dump_chords(sl: ScaleLabel, scale_root_note: Note, file: str):
-    chord_labels = list(chord_label_index.values())
-    chord_labels.sort()
-    with open_data_write(file) as f:
-        f.truncate()
-        s = Scale(scale_root_note, sl)
-        # For each note & interval in this scale that could be the root of the chord
-        for chord_root_note, chord_root_interval in s.note_intervals():
-            # For each potential chord
-            for chord_label in chord_labels:
-                # Translate the chord's intervals so that it's rooted on the chosen chord root note
-                chord_semitones_transposed = chord_label.semitone_bitmap.transpose(
-                    chord_root_interval.semitones
-                )
-
-                if sl.contains_enharmonics(
-                    chord_semitones_transposed.normalize_octave()
-                ):
-                    # The chord label (translated to be rooted on this chord root note) is in the scale
-                    # Print this chord, but with the note names coming from the scale
-                    chord_notes = tuple(
-                        [
-                            n
-                            for (n, i) in s.note_intervals()
-                            if chord_semitones_transposed.contains_semitone(i.semitones)
-                        ]
-                        + [
-                            n.up_octave()
-                            for (n, i) in s.note_intervals()
-                            if chord_semitones_transposed.down_octave().contains_semitone(
-                                i.semitones
-                            )
-                        ]
-                    )
-                    print(
-                        f"{chord_root_note}{prettify(chord_label.name)} {chord_notes}",
-                        file=f,
-                    )
+def dump_chords(sl: ScaleLabel, scale_root_note: Note, name: str):
+    write_records(name, records.chord_in_scale_records(sl, scale_root_note))
 
 
 # Dump all chord labels and chord
 # dump_chord_labels(chord_label_index, "chord_labels_chromatic.txt")
 # for r in root_notes:
 #     dump_chords(
-#         scale_label_index.by_name("chromatic"), r, f"chords_{r.name}_chromatic.txt"
+#         scale_label_index.by_name("chromatic"), r, f"chords_{r.name}_chromatic"
 #     )
 
-# Dump all chord labels within each scale label, and dump all chords within each scale
-for sl in scale_label_index.values():
+
+### Incremental generation
+@cache
+def input_hash(component: str) -> str:
+    if component == "code":
+        # The sources are read rather than imported, so only the modules in use are imported
+        src_dir = os.path.dirname(os.path.abspath(__file__))
+        sources = list()
+        for name in _generating_modules:
+            with open(os.path.join(src_dir, f"{name}.py"), encoding="utf8") as f:
+                sources.append(f.read())
+        return fingerprint(generator_version, sources)
+    elif component == "intervals":
+        return fingerprint(
+            [(i.major_scale_degree, i.rel_semitones) for i in interval_index.values]
+        )
+    elif component == "notes":
+        return fingerprint(
+            valid_notes_names,
+            [
+                (repr(r), [repr(r.add(i)) for i in interval_index.values])
+                for r in root_notes
+            ],
+        )
+    elif component == "scale_labels":
+        return fingerprint(
+            [input_hash(f"scale_label:{n}") for n in scale_label_index.names()]
+        )
+    elif component.startswith("scale_label:"):
+        sl = scale_label_index.by_name(component.removeprefix("scale_label:"))
+        return fingerprint(sl.name, [i.name for i in sl.intervals])
+    elif component == "chord_labels":
+        from chord_label import chord_label_index
+
+        return fingerprint(
+            [
+                (cl.name, [i.name for i in cl.intervals])
+                for cl in chord_label_index.values()
+            ]
+        )
+    elif component == "relationship_rules":
+        import relationship
+
+        return fingerprint(inspect.getsource(relationship))
+    elif component == "chord_db_format":
+        import chord_db
+
+        return fingerprint(chord_db.format_version)
+    elif component == "sqlite_schema":
+        import sqlite_export
+
+        return fingerprint(inspect.getsource(sqlite_export))
+    else:
+        raise KeyError(component)
+
+
+# The inputs that each data file, other than the chords, is generated from
+_file_inputs = {
+    "intervals": ("code", "intervals"),
+    "interval_diffs": ("code", "intervals"),
+    "note_intervals": ("code", "intervals", "notes"),
+    "scale_notes": ("code", "intervals", "notes", "scale_labels"),
+    "note_enharmonic_scales": ("code", "intervals", "notes", "scale_labels"),
+    "scale_label_relative_intervals": ("code", "intervals", "scale_labels"),
+    "relationships": ("code", "intervals", "chord_labels", "relationship_rules"),
+}
+
+
+# The inputs that the binary chord database is generated from
+_chord_db_inputs = (
+    "code",
+    "intervals",
+    "notes",
+    "scale_labels",
+    "chord_labels",
+    "chord_db_format",
+)
+
+
+# The inputs that the SQLite database is generated from
+_sqlite_inputs = (
+    "code",
+    "intervals",
+    "notes",
+    "scale_labels",
+    "chord_labels",
+    "relationship_rules",
+    "sqlite_schema",
+)
+
+
+def _chords_file_inputs(sl: ScaleLabel) -> tuple[str, ...]:
+    return ("code", "intervals", "notes", f"scale_label:{sl.name}", "chord_labels")
+
+
+def _needs_writing(file: str, components: tuple[str, ...]) -> bool:
+    if manifest is None:
+        return True
+    reason = (
+        "forced"
+        if force
+        else manifest.stale_reason(file, {c: input_hash(c) for c in components})
+    )
+    if reason is None:
+        up_to_date.append(file)
+        return False
+    click.echo(f"Writing {file}: {reason}", err=True)
+    return True
+
+
+def _written(file: str, components: tuple[str, ...]):
+    if manifest is not None:
+        manifest.record(file, {c: input_hash(c) for c in components})
+
+
+def generate(name: str):
+    file = data_file_name(name)
+    if _needs_writing(file, _file_inputs[name]):
+        with _stage(name):
+            write_records(name, _data_files[name]())
+        _written(file, _file_inputs[name])
+
+
+def _dump_chords_job(
+    data_dir_path: str, extension: str, scale_label_name: str, root_name: str
+) -> str:
+    # Runs in a worker, which may not have inherited this module's state
+    global data_dir, sink_type
+    data_dir = data_dir_path
+    sink_type = sinks[extension]
+    name = f"chords_{root_name}_{scale_label_name}"
+    dump_chords(scale_label_index.by_name(scale_label_name), Note(root_name), name)
+    return data_file_name(name)
+
+
+# Dump all chords within each of the given scales.
+# Each (scale label, root) is written to its own file, so the files are the same however many
+# jobs they are spread across.
+def write_chords(
+    scale_labels: list[ScaleLabel],
+    roots: list[Note],
+    jobs: int = 1,
+    threads: bool = False,
+):
     # chord_labels_in_scale = chord_label_index.restrict(sl)
     # dump_chord_labels(chord_labels_in_scale, f"chord_labels_{sl.name}.txt")
-    for r in root_notes:
-        dump_chords(sl, r, f"chords_{r.name}_{sl.name}.txt")
-
-# Dump all relationships
-with open_data_write("relationships.txt") as f:
-    f.truncate()
-    for rel in relationships:
-        print(rel.type.name, " ", rel.c1, " -> ", rel.c2, file=f)
-
-with open_data_write("scale_label_relative_intervals.txt") as f:
-    for sl in scale_label_index.values():
-        for i in sl.intervals:
-            print(
-                f"In {sl.name} starting from {i}, the same notes have intervals {sl.relative_to(i)}",
-                file=f,
+    job_args = [
+        (data_dir, sink_type.extension, sl.name, r.name)
+        for sl in scale_labels
+        for r in roots
+        if _needs_writing(
+            data_file_name(f"chords_{r.name}_{sl.name}"), _chords_file_inputs(sl)
+        )
+    ]
+    if not job_args:
+        return
+
+    with _stage("chords"):
+        _write_chords(job_args, jobs, threads)
+
+
+def _write_chords(job_args: list[tuple[str, str, str, str]], jobs: int, threads: bool):
+    if jobs <= 1:
+        with click.progressbar(
+            job_args, label="Writing chords", file=sys.stderr
+        ) as progress:
+            for args in progress:
+                _written(
+                    _dump_chords_job(*args),
+                    _chords_file_inputs(scale_label_index.by_name(args[2])),
+                )
+        return
+
+    # Build the engine before starting the workers, so forked workers inherit it
+    from chord_scale_engine import chord_scale_engine
+
+    executor_type = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    with executor_type(max_workers=jobs) as executor:
+        futures = {executor.submit(_dump_chords_job, *args): args for args in job_args}
+        with click.progressbar(
+            as_completed(futures),
+            length=len(futures),
+            label="Writing chords",
+            file=sys.stderr,
+        ) as completed:
+            for future in completed:
+                _written(
+                    future.result(),
+                    _chords_file_inputs(scale_label_index.by_name(futures[future][2])),
+                )
+
+
+### Command line
+@click.group(invoke_without_command=True)
+@click.option(
+    "--data-dir",
+    "data_dir_path",
+    default="data",
+    show_default=True,
+    help="Directory to write data files to.",
+)
+@click.option(
+    "--format",
+    "format_option",
+    type=click.Choice(list(sinks.keys())),
+    default=TextSink.extension,
+    show_default=True,
+    help="Format to write data files in.",
+)
+@click.option(
+    "--force",
+    "force_option",
+    is_flag=True,
+    help="Write data files even if their inputs haven't changed.",
+)
+@click.option(
+    "--cache-dir",
+    "cache_dir_path",
+    envvar="HARMONY_CACHE_DIR",
+    help="Directory to keep snapshots of the built indexes in, to start up faster.",
+)
+@click.option(
+    "--profile",
+    "profile_path",
+    type=click.Path(dir_okay=False),
+    help="Profile each stage of generation, and write a JSON report to this file.",
+)
+@click.option(
+    "--pstats-dir",
+    "pstats_dir_path",
+    type=click.Path(file_okay=False),
+    help="When profiling, also write a pstats file for each stage to this directory.",
+)
+@click.pass_context
+def cli(
+    ctx: click.Context,
+    data_dir_path: str,
+    format_option: str,
+    force_option: bool,
+    cache_dir_path: str | None,
+    profile_path: str | None,
+    pstats_dir_path: str | None,
+):
+    """Generate the harmony data files.
+
+    With no command, every data file is generated. Data files whose inputs haven't
+    changed since they were last written are skipped.
+    """
+    global data_dir, sink_type, manifest, force, profiler
+    data_dir = data_dir_path
+    sink_type = sinks[format_option]
+    force = force_option
+    lazy.cache_dir = cache_dir_path
+    manifest = Manifest(os.path.join(data_dir, "manifest.json"))
+    if profile_path is not None:
+        profiler = Profiler(pstats_dir_path)
+
+    def finish():
+        if up_to_date:
+            click.echo(f"{len(up_to_date)} data files are up to date", err=True)
+        if manifest is not None and os.path.isdir(data_dir):
+            manifest.save()
+        if profiler is not None and profile_path is not None:
+            click.echo(profiler.summary(), err=True)
+            profiler.save(profile_path)
+
+    ctx.call_on_close(finish)
+    if ctx.invoked_subcommand is None:
+        ctx.invoke(all_command)
+
+
+@cli.command("intervals")
+def intervals_command():
+    """Intervals, and the differences between them."""
+    generate("intervals")
+    generate("interval_diffs")
+
+
+@cli.command("notes")
+def notes_command():
+    """Every interval from every root note."""
+    generate("note_intervals")
+
+
+@cli.command("scales")
+def scales_command():
+    """Scale notes, the scales each note is in, and scale modes."""
+    generate("scale_notes")
+    generate("note_enharmonic_scales")
+    generate("scale_label_relative_intervals")
+
+
+@cli.command("chords")
+@click.option(
+    "--scale",
+    "scale_names",
+    multiple=True,
+    type=click.Choice(list(scale_label_index.names())),
+    help="Scale label to generate chords for. Can be repeated. Defaults to all.",
+)
+@click.option(
+    "--root",
+    "root_names",
+    multiple=True,
+    type=click.Choice(root_note_names),
+    help="Scale root to generate chords for. Can be repeated. Defaults to all.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of workers to write chord files with.",
+)
+@click.option(
+    "--threads",
+    is_flag=True,
+    help="Use a thread pool for the workers, rather than a process pool.",
+)
+def chords_command(
+    scale_names: tuple[str, ...],
+    root_names: tuple[str, ...],
+    jobs: int,
+    threads: bool,
+):
+    """The chords in each scale."""
+    write_chords(
+        (
+            [scale_label_index.by_name(n) for n in scale_names]
+            if scale_names
+            else list(scale_label_index.values())
+        ),
+        [Note(n) for n in root_names] if root_names else root_notes,
+        jobs,
+        threads,
+    )
+
+
+@cli.command("relationships")
+def relationships_command():
+    """Relationships between chord labels."""
+    generate("relationships")
+
+
+@cli.command("db")
+def db_command():
+    """A binary database of every chord in every scale, for ChordDb to read."""
+    from chord_db import write_chord_db
+
+    if _needs_writing("chords.db", _chord_db_inputs):
+        os.makedirs(data_dir, exist_ok=True)
+        with _stage("db"):
+            write_chord_db(os.path.join(data_dir, "chords.db"))
+        _written("chords.db", _chord_db_inputs)
+
+
+@cli.command("sqlite")
+def sqlite_command():
+    """A SQLite database of scales, chords and relationships, for ad-hoc queries."""
+    from sqlite_export import export_sqlite
+
+    if _needs_writing("harmony.sqlite", _sqlite_inputs):
+        os.makedirs(data_dir, exist_ok=True)
+        with _stage("sqlite"):
+            export_sqlite(os.path.join(data_dir, "harmony.sqlite"))
+        _written("harmony.sqlite", _sqlite_inputs)
+
+
+@cli.command("path")
+@click.argument("start")
+@click.argument("end")
+@click.option(
+    "--allow",
+    multiple=True,
+    help="Relationship type the path may follow. Can be repeated. Defaults to all.",
+)
+@click.option(
+    "--deny",
+    multiple=True,
+    help="Relationship type the path may not follow. Can be repeated.",
+)
+@click.option(
+    "--weight",
+    "weight_options",
+    multiple=True,
+    metavar="TYPE=WEIGHT",
+    help="Cost of a relationship type's steps, rather than 1. Can be repeated.",
+)
+def path_command(
+    start: str,
+    end: str,
+    allow: tuple[str, ...],
+    deny: tuple[str, ...],
+    weight_options: tuple[str, ...],
+):
+    """The shortest path of relationships from chord label START to chord label END."""
+    from relationship import relationship_graph
+
+    weights = None
+    if weight_options:
+        weights = dict()
+        for w in weight_options:
+            (type_name, _, weight) = w.rpartition("=")
+            try:
+                value = float(weight)
+            except ValueError:
+                raise click.BadParameter(w, param_hint="--weight")
+            if not type_name:
+                raise click.BadParameter(
+                    f"{w}: no relationship type", param_hint="--weight"
+                )
+            # Dijkstra's algorithm needs weights it can add and compare, so no NaN or infinity
+            if not math.isfinite(value) or value < 0:
+                raise click.BadParameter(
+                    f"{w}: weights must be finite and non-negative",
+                    param_hint="--weight",
+                )
+            weights[type_name] = value
+
+    try:
+        path = relationship_graph.shortest_path(
+            start, end, weights, allow or None, deny
+        )
+    except KeyError as e:
+        raise click.UsageError(f"Unknown chord label or relationship type {e}")
+    if path is None:
+        raise click.ClickException(f"No path from {start!r} to {end!r}")
+    click.echo(relationship_graph.chord_labels[relationship_graph.id(start)])
+    for type_name, cl in path:
+        click.echo(f"  {type_name}  ->  {cl}")
+
+
+@cli.command("voicings")
+@click.argument("root", type=click.Choice(root_note_names))
+@click.argument("chord_label_name", metavar="CHORD_LABEL")
+@click.option(
+    "--low",
+    default=48,
+    show_default=True,
+    type=click.IntRange(0, 127),
+    help="Lowest MIDI pitch (60 is middle C).",
+)
+@click.option(
+    "--high",
+    default=84,
+    show_default=True,
+    type=click.IntRange(0, 127),
+    help="Highest MIDI pitch.",
+)
+@click.option(
+    "--span",
+    default=24,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Most semitones between the lowest and highest voices.",
+)
+@click.option(
+    "--voices",
+    type=click.IntRange(min=1),
+    help="Number of voices, doubling notes as needed. Defaults to one per note.",
+)
+@click.option(
+    "--omit",
+    multiple=True,
+    help="Interval of the chord that doesn't need to be voiced. Can be repeated.",
+)
+@click.option(
+    "--root-position", is_flag=True, help="Only voicings with the root lowest."
+)
+@click.option("--allow-b9", is_flag=True, help="Allow internal b9s between voices.")
+def voicings_command(
+    root: str,
+    chord_label_name: str,
+    low: int,
+    high: int,
+    span: int,
+    voices: int | None,
+    omit: tuple[str, ...],
+    root_position: bool,
+    allow_b9: bool,
+):
+    """Every voicing of a chord, such as: voicings C m7 --voices 4 --omit 5"""
+    from chord_label import chord_label_index
+    from voicing import VoicingConstraints, voicings
+
+    chord_label = chord_label_index.by_name(chord_label_name)
+    if chord_label is None:
+        raise click.BadParameter(chord_label_name, param_hint="CHORD_LABEL")
+    try:
+        constraints = VoicingConstraints(
+            low, high, span, voices, omit, root_position, allow_b9
+        )
+        for v in voicings(Note(root), chord_label, constraints):
+            click.echo(v.text())
+    except KeyError as e:
+        raise click.BadParameter(f"Unknown interval {e}", param_hint="--omit")
+
+
+@cli.command("keys")
+@click.argument("notes", nargs=-1, required=True, type=click.Choice(valid_notes_names))
+@click.option(
+    "--top",
+    default=5,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of scales to list.",
+)
+@click.option(
+    "--tonic",
+    type=click.Choice(valid_notes_names),
+    help="Note heard as the tonic, whose scales are preferred.",
+)
+def keys_command(notes: tuple[str, ...], top: int, tonic: str | None):
+    """The scales that best fit a bag of NOTES, where repeated notes count more, such
+    as: keys C E G B D F# A"""
+    from key_detection import key_detector, pitch_class_counts
+    from prettify import prettify
+
+    for s, score in key_detector.top(
+        pitch_class_counts(notes),
+        top,
+        None if tonic is None else Note(tonic).semitone,
+    ):
+        click.echo(f"{score:7.2f}  {prettify(s.root.name)} {s.scale_label.name}")
+
+
+@cli.command("modes")
+@click.argument("notes", nargs=-1, required=True, type=click.Choice(valid_notes_names))
+def modes_command(notes: tuple[str, ...]):
+    """The scales with exactly the NOTES, each a mode of the others, such as:
+    modes C D E F G A B"""
+    from scale import Scale
+    from scale_label import mode_family_index
+
+    spellings: dict[int, Note] = dict()
+    for n in map(Note, notes):
+        spellings.setdefault(n.semitone, n)
+    for pc, sl in mode_family_index.modes(sum(1 << pc for pc in spellings)):
+        click.echo(repr(Scale(spellings[pc], sl)))
+
+
+@cli.command("analyze")
+@click.argument("corpus", type=click.File("r", encoding="utf8"))
+@click.option(
+    "--output",
+    "-o",
+    type=click.File("w", encoding="utf8"),
+    default="-",
+    help="File to write the analysis to, in --format. Defaults to stdout.",
+)
+@click.option(
+    "--window",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of consecutive chords to find each scale for.",
+)
+@click.option(
+    "--workers",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Number of worker processes, or 0 for one per CPU.",
+)
+def analyze_command(corpus, output, window: int, workers: int):
+    """The best fitting scales for a corpus of chord progressions, one per line of
+    CORPUS (or - for stdin), such as: Dm7 G7 | Cmaj7 A7"""
+    from analyzer import analyze_lines
+
+    sink_type(output).write(
+        analyze_lines(corpus, window, workers or os.cpu_count() or 1)
+    )
+
+
+@cli.command("serve")
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8000, show_default=True, type=click.IntRange(0, 65535))
+def serve_command(host: str, port: int):
+    """Serve JSON queries of the indexes over HTTP, until interrupted. See service.py."""
+    from service import QueryService, load_indexes
+    import asyncio
+
+    load_indexes()
+    service = QueryService()
+    service.precompute()
+    try:
+        asyncio.run(
+            service.serve(
+                host,
+                port,
+                lambda: click.echo(f"Serving on http://{host}:{port}", err=True),
             )
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command("all")
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of workers to write chord files with.",
+)
+@click.option(
+    "--threads",
+    is_flag=True,
+    help="Use a thread pool for the workers, rather than a process pool.",
+)
+def all_command(jobs: int = 1, threads: bool = False):
+    """Every data file."""
+    generate("intervals")
+    generate("interval_diffs")
+    generate("note_intervals")
+    generate("scale_notes")
+    generate("note_enharmonic_scales")
+    write_chords(list(scale_label_index.values()), root_notes, jobs, threads)
+    generate("relationships")
+    generate("scale_label_relative_intervals")
+
+
+if __name__ == "__main__":
+    cli()
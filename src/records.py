@@ -0,0 +1,200 @@
+from collections import namedtuple
+from interval import Interval, interval_index
+from note import Note, root_notes, valid_notes_names
+from prettify import prettify
+from scale_label import ScaleLabel, scale_label_index
+from typing import Iterator
+
+# Structured records for each of the data files.
+#
+# Each record can be rendered as a line of the text data files with text(), or as plain values
+# (strings, numbers and lists of them) for other formats with plain(). Notes' plain values are
+# their names, followed by +/- and the number of octaves if they are in another octave.
+
+
+def _plain_note(n: Note) -> str:
+    return n.name + ("" if n.rel_octave == 0 else f"{n.rel_octave:+d}")
+
+
+class IntervalRecord(namedtuple("IntervalRecord", ["interval"])):
+    def text(self) -> str:
+        return f"{self.interval} ({self.interval.semitones} total semitones)"
+
+    def plain(self) -> dict:
+        return {"interval": self.interval.name, "semitones": self.interval.semitones}
+
+
+class IntervalDiffRecord(namedtuple("IntervalDiffRecord", ["i1", "i2", "diff"])):
+    def text(self) -> str:
+        return f"{self.i1} to {self.i2} is a {self.diff}"
+
+    def plain(self) -> dict:
+        return {"i1": self.i1.name, "i2": self.i2.name, "diff": self.diff.name}
+
+
+class NoteIntervalRecord(
+    namedtuple("NoteIntervalRecord", ["root", "interval", "note"])
+):
+    def text(self) -> str:
+        return f"{self.root} interval {self.interval} = {self.note}"
+
+    def plain(self) -> dict:
+        return {
+            "root": _plain_note(self.root),
+            "interval": self.interval.name,
+            "note": _plain_note(self.note),
+        }
+
+
+class ScaleRecord(namedtuple("ScaleRecord", ["scale"])):
+    def text(self) -> str:
+        return repr(self.scale)
+
+    def plain(self) -> dict:
+        return {
+            "root": _plain_note(self.scale.root),
+            "scale_label": self.scale.scale_label.name,
+            "notes": [_plain_note(n) for n in self.scale.notes],
+        }
+
+
+class NoteScalesRecord(namedtuple("NoteScalesRecord", ["note_name", "scale_names"])):
+    def text(self) -> str:
+        return f"{self.note_name} {self.scale_names}"
+
+    def plain(self) -> dict:
+        return {"note": self.note_name, "scales": self.scale_names}
+
+
+class ChordInScaleRecord(
+    namedtuple("ChordInScaleRecord", ["scale", "chord_root", "chord_label", "notes"])
+):
+    def text(self) -> str:
+        return f"{self.chord_root}{prettify(self.chord_label.name)} {self.notes}"
+
+    def plain(self) -> dict:
+        return {
+            "scale": self.scale.name,
+            "chord_root": _plain_note(self.chord_root),
+            "chord_label": self.chord_label.name,
+            "notes": [_plain_note(n) for n in self.notes],
+        }
+
+
+class RelationshipRecord(namedtuple("RelationshipRecord", ["rel_type", "c1", "c2"])):
+    def text(self) -> str:
+        return f"{self.rel_type}   {self.c1}  ->  {self.c2}"
+
+    def plain(self) -> dict:
+        return {"type": self.rel_type, "c1": self.c1.name, "c2": self.c2.name}
+
+
+class ScaleLabelRelativeIntervalsRecord(
+    namedtuple(
+        "ScaleLabelRelativeIntervalsRecord", ["scale_label", "interval", "intervals"]
+    )
+):
+    def text(self) -> str:
+        return f"In {self.scale_label.name} starting from {self.interval}, the same notes have intervals {self.intervals}"
+
+    def plain(self) -> dict:
+        return {
+            "scale_label": self.scale_label.name,
+            "interval": self.interval.name,
+            "intervals": [i.name for i in self.intervals.intervals],
+        }
+
+
+class ProgressionRecord(
+    namedtuple("ProgressionRecord", ["line", "chords", "unparsed", "scales"])
+):
+    # The chord symbols of a line of a corpus that were parsed and those that weren't, and the
+    # best fitting scale for each window of chords, with the number of notes outside it
+    def text(self) -> str:
+        chords = " ".join(prettify(str(c)) for c in self.chords)
+        scales = "; ".join(
+            f"{prettify(s.root.name)} {s.scale_label.name}"
+            + (f" ({outside} outside)" if outside else "")
+            for (s, outside) in self.scales
+        )
+        unparsed = f"  unparsed {self.unparsed}" if self.unparsed else ""
+        return f"{self.line}: {chords}  ->  {scales}{unparsed}"
+
+    def plain(self) -> dict:
+        return {
+            "line": self.line,
+            "chords": [str(c) for c in self.chords],
+            "unparsed": self.unparsed,
+            "scales": [s.name for (s, _) in self.scales],
+            "outside": [outside for (_, outside) in self.scales],
+        }
+
+
+### Generators
+def interval_records() -> Iterator[IntervalRecord]:
+    for i in interval_index.values:
+        yield IntervalRecord(i)
+
+
+# Differences between intervals
+def interval_diff_records() -> Iterator[IntervalDiffRecord]:
+    for x in range(len(interval_index.values)):
+        i1 = interval_index.values[x]
+        for y in range(x, len(interval_index.values)):
+            i2 = interval_index.values[y]
+            yield IntervalDiffRecord(i1, i2, interval_index.diff(x, y))
+
+
+# All notes and intervals between them
+def note_interval_records() -> Iterator[NoteIntervalRecord]:
+    for r in root_notes:
+        for i in interval_index.values:
+            yield NoteIntervalRecord(r, i, r.add(i))
+
+
+# All scales's notes
+def scale_records() -> Iterator[ScaleRecord]:
+    from scale import scale_index
+
+    for s in scale_index.values():
+        yield ScaleRecord(s)
+
+
+# Each note which scales it (or its enharmonics) is in
+def note_scale_records() -> Iterator[NoteScalesRecord]:
+    from scale import scale_index
+
+    for n in valid_notes_names:
+        yield NoteScalesRecord(n, [s.name for s in scale_index.containing([n])])
+
+
+# Every chord label, rooted on every note of a scale, that is in the scale.
+# The chord's note names come from the scale.
+def chord_in_scale_records(
+    sl: ScaleLabel, scale_root_note: Note
+) -> Iterator[ChordInScaleRecord]:
+    from chord_scale_engine import chord_scale_engine
+    from scale import Scale
+
+    s = Scale(scale_root_note, sl)
+    for (
+        chord_root_note,
+        chord_label,
+        chord_notes,
+    ) in chord_scale_engine.chords_in_scale(sl, scale_root_note):
+        yield ChordInScaleRecord(s, chord_root_note, chord_label, chord_notes)
+
+
+def relationship_records() -> Iterator[RelationshipRecord]:
+    from relationship import relationships
+
+    for rel in relationships:
+        yield RelationshipRecord(rel.type.name, rel.c1, rel.c2)
+
+
+def scale_label_relative_interval_records() -> (
+    Iterator[ScaleLabelRelativeIntervalsRecord]
+):
+    for sl in scale_label_index.values():
+        for i in sl.intervals:
+            yield ScaleLabelRelativeIntervalsRecord(sl, i, sl.relative_to(i))
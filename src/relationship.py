@@ -1,49 +1,100 @@
-from chord_label import ChordLabel, chord_label_index
-from collections import namedtuple
+from array import array
+from chord_label import ChordLabel, ChordLabelIndex
+from collections import deque, namedtuple
+from functools import cache
 from interval import Interval, interval_index
-from typing import Iterable
+from lazy import module_getattr
+from typing import TYPE_CHECKING, Iterable, Mapping
+import chord_label
+import heapq
 
+if TYPE_CHECKING:
+    # Only distances() needs NumPy, so it's imported there, rather than on every run
+    import numpy as np
 
-def _tuple_remove(t: tuple, a):
-    l = list(t)
-    l.remove(a)
-    return tuple(l)
 
+@cache
+def _intervals_key(ii: tuple[str | Interval, ...]) -> int | None:
+    return interval_index.key(map(interval_index.get, ii))
 
-def _tuple_replace(t: tuple, a, b):
-    l = list(t)
-    i = l.index(a)
-    l[i] = b
-    return tuple(l)
+
+_relationship_types: dict[tuple[str, str], "RelationshipType"] = dict()
 
 
 class RelationshipType:
-    def __init__(self, name: str, inverse_name: str):
+    __slots__ = ("name", "inverse_name")
+
+    name: str
+    inverse_name: str
+
+    def __new__(cls, name: str, inverse_name: str):
+        # Relationship types are interned, so each type and its inverse are only built once,
+        # however many edges refer to them.
+        self = _relationship_types.get((name, inverse_name))
+        if self is not None:
+            return self
+
+        self = super().__new__(cls)
         self.name = name
         self.inverse_name = inverse_name
+        _relationship_types[(name, inverse_name)] = self
+        return self
 
-    def inverse(self):
+    def __reduce__(self):
+        # Unpickling goes back through __new__, so it returns the interned instance
+        return (RelationshipType, (self.name, self.inverse_name))
+
+    def __repr__(self):
+        return f"RelationshipType({self.name!r}, {self.inverse_name!r})"
+
+    def inverse(self) -> "RelationshipType":
         return RelationshipType(self.inverse_name, self.name)
 
 
+# The fixed set of relationship types, and their inverses
+neutralize_major = RelationshipType("neutralize", "make major")
+neutralize_minor = RelationshipType("neutralize", "make minor")
+sparser = RelationshipType("sparser", "denser")
+de_extend = RelationshipType("de-extend", "extend")
+interchange = RelationshipType("interchange", "interchange")
+for t in list(_relationship_types.values()):
+    t.inverse()
+del t
+
+
 Relationship = namedtuple("Relationship", ["type", "c1", "c2"])
 
 
 class Relationships(list):
-    def __init__(self):
-        self._r = list()
+    def __init__(self, chord_label_index: ChordLabelIndex):
+        self._chord_label_index = chord_label_index
+        self._r: list[Relationship] = list()
+        # Edges already added, by type and chord label names, since chord labels are unhashable
+        self._keys: set[tuple[RelationshipType, str, str]] = set()
+        self.duplicates = 0
 
     def __iter__(self):
         return self._r.__iter__()
 
+    def __len__(self) -> int:
+        return len(self._r)
+
+    def _add(self, type: RelationshipType, c1: ChordLabel, c2: ChordLabel):
+        key = (type, c1.name, c2.name)
+        if key in self._keys:
+            self.duplicates += 1
+            return
+        self._keys.add(key)
+        self._r.append(Relationship(type, c1, c2))
+
     def add(
         self,
         type: RelationshipType,
         c1: ChordLabel,
         c2: ChordLabel,
     ):
-        self._r.append(Relationship(type, c1, c2))
-        self._r.append(Relationship(type.inverse(), c2, c1))
+        self._add(type, c1, c2)
+        self._add(type.inverse(), c2, c1)
 
     def add_with_interval_omitted(
         self,
@@ -59,15 +110,21 @@ class Relationships(list):
         c: ChordLabel,
         ii: Iterable[str | Interval],
     ):
-        ii2 = map(interval_index.get, ii)
-
-        intervals2 = list(c.intervals)
-        for i in ii2:
-            if i not in c.intervals:
-                return
-            intervals2.remove(i)
-
-        c2 = chord_label_index.by_intervals(tuple(intervals2))
+        # Intervals are removed by clearing their bits in the chord label's key, or from its
+        # intervals if it has an interval that can't be keyed
+        ii = tuple(ii)
+        omitted = _intervals_key(ii)
+        if c.key is None or omitted is None:
+            intervals2 = list(c.intervals)
+            for i in map(interval_index.get, ii):
+                if i not in intervals2:
+                    return
+                intervals2.remove(i)
+            c2 = self._chord_label_index.by_intervals(tuple(intervals2))
+        elif c.key & omitted == omitted:
+            c2 = self._chord_label_index.by_key(c.key & ~omitted)
+        else:
+            return
         if c2 is not None:
             self.add(type, c, c2)
 
@@ -78,13 +135,23 @@ class Relationships(list):
         i1: str | Interval,
         i2: str | Interval,
     ):
-        i1 = interval_index.get(i1)
-        i2 = interval_index.get(i2)
-        if i1 in c.intervals:
-            intervals2 = _tuple_replace(c.intervals, i1, i2)
-            c2 = chord_label_index.by_intervals(intervals2)
-            if c2 is not None:
-                self.add(type, c, c2)
+        # The interval is replaced by moving its bit in the chord label's key, or in its
+        # intervals if it has an interval that can't be keyed
+        b1 = _intervals_key((i1,))
+        b2 = _intervals_key((i2,))
+        if c.key is None or b1 is None or b2 is None:
+            (i1, i2) = (interval_index.get(i1), interval_index.get(i2))
+            if i1 not in c.intervals or i2 in c.intervals:
+                return
+            c2 = self._chord_label_index.by_intervals(
+                tuple(i2 if i == i1 else i for i in c.intervals)
+            )
+        elif c.key & b1 and not c.key & b2:
+            c2 = self._chord_label_index.by_key(c.key & ~b1 | b2)
+        else:
+            return
+        if c2 is not None:
+            self.add(type, c, c2)
 
 
 # todo relationships:
@@ -104,48 +171,262 @@ class Relationships(list):
 #   backdoor dominant sub
 # invert
 
-relationships = Relationships()
-for c in chord_label_index.values():
-    relationships.add_with_interval_omitted(
-        RelationshipType("neutralize", "make major"), c, "3"
-    )
-    relationships.add_with_interval_omitted(
-        RelationshipType("neutralize", "make minor"), c, "b3"
-    )
-
-    # sparser/denser
-    relationships.add_with_interval_omitted(
-        RelationshipType("sparser", "denser"), c, "5"
-    )
-
-    for x in ("b3", "3"):
-        for y in ("11", "#11"):
+
+def _build_relationships(chord_label_index: ChordLabelIndex) -> Relationships:
+    relationships = Relationships(chord_label_index)
+    for c in chord_label_index.values():
+        relationships.add_with_interval_omitted(neutralize_major, c, "3")
+        relationships.add_with_interval_omitted(neutralize_minor, c, "b3")
+
+        # sparser/denser
+        relationships.add_with_interval_omitted(sparser, c, "5")
+
+        for x in ("b3", "3"):
             # TODO: Add comments to these relationships
-            relationships.add_with_intervals_omitted(
-                RelationshipType("sparser", "denser"), c, [x]
-            )
-            relationships.add_with_intervals_omitted(
-                RelationshipType("sparser", "denser"), c, [x, "5"]
-            )
-            relationships.add_with_intervals_omitted(
-                RelationshipType("sparser", "denser"), c, [x, "b9"]
-            )
+            relationships.add_with_intervals_omitted(sparser, c, [x])
+            relationships.add_with_intervals_omitted(sparser, c, [x, "5"])
+            relationships.add_with_intervals_omitted(sparser, c, [x, "b9"])
 
-    # extensions
-    for i in ["b7", "7", "b9", "9", "#9", "11", "#11"]:
-        relationships.add_with_interval_omitted(
-            RelationshipType("de-extend", "extend"), c, i
-        )
+        # extensions
+        for i in ["b7", "7", "b9", "9", "#9", "11", "#11"]:
+            relationships.add_with_interval_omitted(de_extend, c, i)
+
+        # interchange
+        for i1, i2 in [
+            ("b3", "3"),
+            ("b7", "7"),
+            ("b9", "9"),
+            ("b9", "#9"),
+            ("9", "#9"),
+            ("11", "#11"),
+        ]:
+            relationships.add_with_interval_changed(interchange, c, i1, i2)
+
+    return relationships
+
+
+### Graph
+class RelationshipGraph:
+    # The relationships between chord labels, as adjacency arrays over integer chord label ids.
+    #
+    # Edges are grouped by their source chord label, CSR style: the edges from chord label id x
+    # are at positions _offsets[x] to _offsets[x + 1] of _targets and _types. Each relationship
+    # type's edges are also partitioned into their own CSR arrays, with targets sorted.
+    def __init__(
+        self, chord_labels: Iterable[ChordLabel], relationships: Iterable[Relationship]
+    ):
+        self.chord_labels = list(chord_labels)
+        self._ids = {cl.name: x for (x, cl) in enumerate(self.chord_labels)}
+        self.type_names: list[str] = list()
+        self._type_ids: dict[str, int] = dict()
 
-    # interchange
-    for i1, i2 in [
-        ("b3", "3"),
-        ("b7", "7"),
-        ("b9", "9"),
-        ("b9", "#9"),
-        ("9", "#9"),
-        ("11", "#11"),
-    ]:
-        relationships.add_with_interval_changed(
-            RelationshipType("interchange", "interchange"), c, i1, i2
+        edges: list[list[tuple[int, int]]] = [list() for _ in self.chord_labels]
+        for rel in relationships:
+            t = self._type_ids.get(rel.type.name)
+            if t is None:
+                t = self._type_ids[rel.type.name] = len(self.type_names)
+                self.type_names.append(rel.type.name)
+            edges[self._ids[rel.c1.name]].append((t, self._ids[rel.c2.name]))
+
+        self._offsets = array("I", [0])
+        self._targets = array("I")
+        self._types = array("B")
+        self._sources = array("I")
+        for x, e in enumerate(edges):
+            self._sources.extend([x] * len(e))
+            self._targets.extend(target for (_, target) in e)
+            self._types.extend(t for (t, _) in e)
+            self._offsets.append(len(self._targets))
+
+        # All-pairs distance matrices, by the relationship type ids they were searched over
+        self._distances: dict[frozenset[int], np.ndarray] = dict()
+
+        self._partitions: list[tuple[array, array]] = list()
+        for t in range(len(self.type_names)):
+            offsets = array("I", [0])
+            targets = array("I")
+            for e in edges:
+                targets.extend(sorted(target for (t2, target) in e if t2 == t))
+                offsets.append(len(targets))
+            self._partitions.append((offsets, targets))
+
+    def __len__(self) -> int:
+        return len(self.chord_labels)
+
+    def edge_count(self) -> int:
+        return len(self._targets)
+
+    def id(self, c: str | ChordLabel) -> int:
+        return self._ids[c if isinstance(c, str) else c.name]
+
+    def type_id(self, type: str | RelationshipType) -> int:
+        return self._type_ids[type if isinstance(type, str) else type.name]
+
+    def neighbor_ids(self, x: int, type: str | RelationshipType | None = None) -> array:
+        if type is None:
+            return self._targets[self._offsets[x] : self._offsets[x + 1]]
+        (offsets, targets) = self._partitions[self.type_id(type)]
+        return targets[offsets[x] : offsets[x + 1]]
+
+    def neighbors(
+        self, c: str | ChordLabel, type: str | RelationshipType | None = None
+    ) -> list[ChordLabel]:
+        return [self.chord_labels[y] for y in self.neighbor_ids(self.id(c), type)]
+
+    def edges(self, c: str | ChordLabel) -> list[tuple[str, ChordLabel]]:
+        # The (relationship type name, chord label) of every edge from this chord label
+        x = self.id(c)
+        return [
+            (self.type_names[self._types[e]], self.chord_labels[self._targets[e]])
+            for e in range(self._offsets[x], self._offsets[x + 1])
+        ]
+
+    def has_edge(
+        self,
+        c1: str | ChordLabel,
+        c2: str | ChordLabel,
+        type: str | RelationshipType | None = None,
+    ) -> bool:
+        return self.id(c2) in self.neighbor_ids(self.id(c1), type)
+
+    ### Search
+    def type_ids(
+        self,
+        allow: Iterable[str | RelationshipType] | None = None,
+        deny: Iterable[str | RelationshipType] = (),
+    ) -> frozenset[int]:
+        # The relationship types a search may follow: those allowed (or all), less those denied
+        allowed = (
+            set(range(len(self.type_names)))
+            if allow is None
+            else {self.type_id(t) for t in allow}
         )
+        return frozenset(allowed - {self.type_id(t) for t in deny})
+
+    def shortest_path(
+        self,
+        start: str | ChordLabel,
+        end: str | ChordLabel,
+        weights: Mapping[str, float] | None = None,
+        allow: Iterable[str | RelationshipType] | None = None,
+        deny: Iterable[str | RelationshipType] = (),
+    ) -> list[tuple[str, ChordLabel]] | None:
+        # The (relationship type name, chord label) steps of the shortest path from start to
+        # end, or None if there isn't one.
+        # Steps cost the weight of their relationship type name, or 1 if it isn't weighted.
+        # Unweighted searches are breadth first, and weighted ones use Dijkstra's algorithm.
+        types = self.type_ids(allow, deny)
+        (x, y) = (self.id(start), self.id(end))
+        if weights is None:
+            (previous, _) = self._bfs(x, types, y)
+        else:
+            for n in weights:
+                # Unknown relationship types raise KeyError, as they do in allow and deny
+                self.type_id(n)
+            type_weights = [weights.get(n, 1) for n in self.type_names]
+            if any(w < 0 for w in type_weights):
+                raise ValueError("Relationship type weights can't be negative")
+            previous = self._dijkstra(x, types, type_weights, y)
+        if y not in previous:
+            return None
+
+        path = list()
+        while y != x:
+            e = previous[y]
+            path.append((self.type_names[self._types[e]], self.chord_labels[y]))
+            y = self._sources[e]
+        path.reverse()
+        return path
+
+    def _bfs(
+        self, x: int, types: frozenset[int], end: int | None = None
+    ) -> tuple[dict[int, int], dict[int, int]]:
+        # The edge each chord label reachable from x was first reached by, and the number of
+        # steps to each of them
+        previous: dict[int, int] = {x: -1}
+        distances = {x: 0}
+        queue = deque([x])
+        while queue and end not in previous:
+            y = queue.popleft()
+            for e in range(self._offsets[y], self._offsets[y + 1]):
+                z = self._targets[e]
+                if z not in previous and self._types[e] in types:
+                    previous[z] = e
+                    distances[z] = distances[y] + 1
+                    queue.append(z)
+        return (previous, distances)
+
+    def _dijkstra(
+        self, x: int, types: frozenset[int], weights: list[float], end: int
+    ) -> dict[int, int]:
+        previous: dict[int, int] = {x: -1}
+        distances: dict[int, float] = {x: 0}
+        done = set()
+        heap: list[tuple[float, int]] = [(0, x)]
+        while heap:
+            (d, y) = heapq.heappop(heap)
+            if y in done:
+                continue
+            if y == end:
+                break
+            done.add(y)
+            for e in range(self._offsets[y], self._offsets[y + 1]):
+                if self._types[e] not in types:
+                    continue
+                z = self._targets[e]
+                d2 = d + weights[self._types[e]]
+                if z not in distances or d2 < distances[z]:
+                    distances[z] = d2
+                    previous[z] = e
+                    heapq.heappush(heap, (d2, z))
+        return previous
+
+    def distances(
+        self,
+        allow: Iterable[str | RelationshipType] | None = None,
+        deny: Iterable[str | RelationshipType] = (),
+    ) -> "np.ndarray":
+        # All-pairs numbers of steps, by chord label id, with 255 where there's no path.
+        # Each set of relationship types is only searched once, after which lookups are O(1).
+        import numpy as np
+
+        types = self.type_ids(allow, deny)
+        distances = self._distances.get(types)
+        if distances is None:
+            distances = np.full((len(self), len(self)), 255, np.uint8)
+            for x in range(len(self)):
+                for y, d in self._bfs(x, types)[1].items():
+                    distances[x, y] = min(d, 255)
+            distances.flags.writeable = False
+            self._distances[types] = distances
+        return distances
+
+    def distance(
+        self,
+        start: str | ChordLabel,
+        end: str | ChordLabel,
+        allow: Iterable[str | RelationshipType] | None = None,
+        deny: Iterable[str | RelationshipType] = (),
+    ) -> int | None:
+        d = int(self.distances(allow, deny)[self.id(start), self.id(end)])
+        return None if d == 255 else d
+
+
+relationships: Relationships
+relationship_graph: RelationshipGraph
+
+
+def _build_relationship_graph() -> RelationshipGraph:
+    from chord_label import chord_label_index
+    from relationship import relationships
+
+    return RelationshipGraph(chord_label_index.values(), relationships)
+
+
+__getattr__ = module_getattr(
+    __name__,
+    {
+        "relationships": lambda: _build_relationships(chord_label.chord_label_index),
+        "relationship_graph": _build_relationship_graph,
+    },
+)
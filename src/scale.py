@@ -1,6 +1,9 @@
-from note import Note
+from interval_set import Bitmap
+from lazy import module_getattr
+from note import Note, root_notes
 from prettify import prettify
-from scale_label import ScaleLabel
+from scale_label import ScaleLabel, scale_label_index
+from typing import Iterable
 
 
 class Scale:
@@ -9,15 +12,71 @@ class Scale:
         self.scale_label = scale_label
         self.name = f"{root.name} {scale_label.name}"
         self.notes = tuple(map(root.add, scale_label.intervals))
+        self.pitch_class_bitmap = Bitmap(0)
+        for n in self.notes:
+            self.pitch_class_bitmap |= 1 << n.semitone
 
     def __repr__(self):
         return f"{prettify(self.root.name)} {self.scale_label.name} {self.notes}"
 
     def contains_note_or_enharmonic(self, note: str | Note):
-        note_name = note if isinstance(note, str) else note.name
-        return any(note_name == n.name for n in self.notes) or any(
-            note_name == e for n in self.notes for e in n.enharmonic_note_names()
-        )
+        note = note if isinstance(note, Note) else Note(note)
+        return self.pitch_class_bitmap & (1 << note.semitone) != 0
 
     def note_intervals(self):
         return zip(self.notes, self.scale_label.intervals)
+
+
+### Index
+class ScaleIndex:
+    def __init__(self, roots: Iterable[Note], scale_labels: Iterable[ScaleLabel]):
+        scale_labels = list(scale_labels)
+        self._values = [Scale(r, sl) for r in roots for sl in scale_labels]
+        self._by_name = {s.name: s for s in self._values}
+
+        # For each pitch class, a bitmap of the positions in _values of the scales that
+        # contain it
+        self._by_pitch_class = [0] * 12
+        for x, s in enumerate(self._values):
+            for pc in range(12):
+                if s.pitch_class_bitmap & (1 << pc):
+                    self._by_pitch_class[pc] |= 1 << x
+
+    def values(self) -> Iterable[Scale]:
+        return self._values
+
+    def by_name(self, name: str) -> Scale:
+        return self._by_name[name]
+
+    def containing(self, notes: Iterable[str | Note]) -> list[Scale]:
+        positions = (1 << len(self._values)) - 1
+        for n in notes:
+            n = n if isinstance(n, Note) else Note(n)
+            positions &= self._by_pitch_class[n.semitone]
+        return self._at(positions)
+
+    def containing_pitch_classes(self, bitmap: int) -> list[Scale]:
+        positions = (1 << len(self._values)) - 1
+        for pc in range(12):
+            if bitmap & (1 << pc):
+                positions &= self._by_pitch_class[pc]
+        return self._at(positions)
+
+    def _at(self, positions: int) -> list[Scale]:
+        result = list()
+        while positions:
+            lowest = positions & -positions
+            result.append(self._values[lowest.bit_length() - 1])
+            positions ^= lowest
+        return result
+
+
+# Every scale on every supported root, with its notes extended up to the 11th
+scale_index: ScaleIndex
+
+
+def _build_scale_index() -> ScaleIndex:
+    return ScaleIndex(root_notes, [sl.extended() for sl in scale_label_index.values()])
+
+
+__getattr__ = module_getattr(__name__, {"scale_index": _build_scale_index})
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from interval import Interval, interval_index
-from interval_set import IntervalSet
+from interval_set import Bitmap, IntervalSet, rotate_pitch_classes
+from lazy import module_getattr
 from typing import Iterable, Self
 
 
@@ -9,6 +10,17 @@ class ScaleLabel(IntervalSet):
     def __init__(self, name, intervals: Iterable[str | Interval]):
         super().__init__(intervals)
         self.name = name
+        # The scale's rotations: its intervals relative to each of its own intervals, by that
+        # interval in the first octave
+        self.rotations: dict[Interval, IntervalSet] = dict()
+        for i in self.intervals:
+            root = i.normalize_octave()
+            if root not in self.rotations:
+                self.rotations[root] = super().relative_to(root)
+
+    def relative_to(self, new_root: str | Interval) -> IntervalSet:
+        rotation = self.rotations.get(interval_index.get(new_root).normalize_octave())
+        return rotation if rotation is not None else super().relative_to(new_root)
 
     def extended(self) -> Self:
         extended_intervals = [
@@ -41,6 +53,70 @@ class ScaleLabelIndex:
         return self._by_name[name]
 
 
+def canonical_rotation(pitch_classes: int) -> Bitmap:
+    # The lowest of the rotations of a pitch class bitmap onto each of its pitch classes, or 0
+    # for no pitch classes, which no scale label has
+    if pitch_classes & ~0xFFF:
+        raise ValueError(f"{pitch_classes:#x} isn't a 12-bit pitch class bitmap")
+    if not pitch_classes:
+        return Bitmap(0)
+    return min(
+        rotate_pitch_classes(pitch_classes, -pc)
+        for pc in range(12)
+        if pitch_classes & (1 << pc)
+    )
+
+
+class ModeFamilyIndex:
+    # Scale labels grouped into mode families: scale labels with the same notes as each other,
+    # on different roots, like ionian and dorian. Each family is keyed by the canonical
+    # rotation of its scale labels' pitch class bitmaps.
+    def __init__(self, scale_labels: Iterable[ScaleLabel]):
+        self._families: dict[Bitmap, list[ScaleLabel]] = dict()
+        # Each scale label's pitch class bitmap, relative to its root
+        self._pitch_classes: dict[str, Bitmap] = dict()
+        for sl in scale_labels:
+            pitch_classes = sl.semitone_bitmap.pitch_classes()
+            self._pitch_classes[sl.name] = pitch_classes
+            self._families.setdefault(canonical_rotation(pitch_classes), []).append(sl)
+
+    def family(self, sl: ScaleLabel) -> list[tuple[int, ScaleLabel]]:
+        # Every scale label in the scale label's family, with the semitones from the scale
+        # label's root up to its root, in order up from the scale label's root
+        return self.modes(self._pitch_classes[sl.name])
+
+    def modes(self, pitch_classes: int) -> list[tuple[int, ScaleLabel]]:
+        # The scale labels, and the pitch classes they're rooted on, that have exactly the
+        # pitch classes of a 12-bit bitmap, in the order of their roots
+        family = self._families.get(canonical_rotation(pitch_classes), [])
+        return [
+            (pc, sl)
+            for pc in range(12)
+            if pitch_classes & (1 << pc)
+            for sl in self._rooted(family, pitch_classes, pc)
+        ]
+
+    def modes_rooted(self, pitch_classes: int, root: int) -> list[ScaleLabel]:
+        # The scale labels that have exactly the pitch classes of a bitmap, on one of them
+        family = self._families.get(canonical_rotation(pitch_classes), [])
+        return self._rooted(family, pitch_classes, root)
+
+    def _rooted(
+        self, family: list[ScaleLabel], pitch_classes: int, root: int
+    ) -> list[ScaleLabel]:
+        rotation = rotate_pitch_classes(pitch_classes, -root)
+        return [sl for sl in family if self._pitch_classes[sl.name] == rotation]
+
+    def mode(self, sl: ScaleLabel, n: int) -> ScaleLabel | None:
+        # The scale label of the scale label's nth mode, i.e. its rotation onto its nth
+        # interval, if there is one. sl.relative_to gives the rotation's intervals either way.
+        if not 1 <= n <= len(sl.intervals):
+            raise ValueError(f"{sl.name} has no mode {n}")
+        root = sl.intervals[n - 1].semitones % 12
+        modes = self.modes_rooted(self._pitch_classes[sl.name], root)
+        return modes[0] if modes else None
+
+
 scale_label_index = ScaleLabelIndex()
 scale_label_index.add_many(
     [
@@ -56,3 +132,14 @@ scale_label_index.add_many(
         ScaleLabel("harmonic minor", ["1", "2", "b3", "4", "5", "b6", "b7", "7"]),
     ]
 )
+
+
+# Scale labels by their mode family
+mode_family_index: ModeFamilyIndex
+
+
+def _build_mode_family_index() -> ModeFamilyIndex:
+    return ModeFamilyIndex(scale_label_index.values())
+
+
+__getattr__ = module_getattr(__name__, {"mode_family_index": _build_mode_family_index})
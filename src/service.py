@@ -0,0 +1,307 @@
+from chord_symbol import ChordSymbol, parse_chord_symbol
+from collections import OrderedDict, deque
+from interval import interval_index
+from note import Note, root_note_names
+from records import ChordInScaleRecord, RelationshipRecord, ScaleRecord
+from scale import Scale
+from scale_label import scale_label_index
+from typing import Any, Callable
+from urllib.parse import parse_qsl, urlencode, urlsplit
+import asyncio
+import json
+
+# A local HTTP service that answers JSON queries from the indexes, which are built (or loaded
+# from snapshots, see lazy.py) once, when it starts. Endpoints, all GET with query parameters:
+# * /identify?notes=C,E,G,Bb[&limit=10]: Chords with the notes, the first of them the lowest
+# * /scale?root=C&scale_label=ionian: The scale's notes
+# * /chords_in_scale?root=C&scale_label=ionian: The chords in the scale, spelled from it
+# * /neighbors?chord_label=m7[&type=sparser]: The chord label's relationships
+# * /transpose?interval=b3&symbol=F%23m7/C%23, or &notes=C,E,G: Notes or a chord symbol, up
+#
+# Parameter values are URL encoded, so sharps are sent as %23: an unencoded # starts the URL's
+# fragment, and requests with a fragment are rejected. Parameters may be empty, such as
+# chord_label= for the major triad.
+#
+# Responses are JSON, with an "error" for requests that can't be answered. Each distinct
+# response is computed once, and then served from a cache. Identical requests that arrive
+# before it's computed wait for that computation, rather than starting their own.
+# Responses are computed on the event loop thread: each takes well under a millisecond once
+# the indexes are built, far less than handing it to another thread and back would.
+
+
+def _param(params: dict[str, str], name: str) -> str:
+    value = params.get(name)
+    if value is None:
+        raise ValueError(f"Missing parameter {name}")
+    return value
+
+
+def _notes(params: dict[str, str]) -> list[Note]:
+    return [Note(n) for n in _param(params, "notes").split(",") if n]
+
+
+def _scale(params: dict[str, str]) -> Scale:
+    sl = scale_label_index.by_name(_param(params, "scale_label"))
+    return Scale(Note(_param(params, "root")), sl)
+
+
+def identify(params: dict[str, str]) -> Any:
+    from chord import chord_identification_index
+
+    limit = int(params.get("limit", "10"))
+    if limit < 0:
+        raise ValueError(f"Negative limit {limit}")
+    return [
+        {
+            "root": m.root.name,
+            "chord_label": m.chord_label.name,
+            "inversion": m.inversion,
+            "missing": m.missing,
+            "extra": m.extra,
+        }
+        for m in chord_identification_index.identify(_notes(params))[:limit]
+    ]
+
+
+def scale(params: dict[str, str]) -> Any:
+    return ScaleRecord(_scale(params)).plain()
+
+
+def chords_in_scale(params: dict[str, str]) -> Any:
+    from chord_scale_engine import chord_scale_engine
+
+    s = _scale(params)
+    return [
+        ChordInScaleRecord(s, root, cl, notes).plain()
+        for (root, cl, notes) in chord_scale_engine.chords_in_scale(
+            s.scale_label, s.root
+        )
+    ]
+
+
+def neighbors(params: dict[str, str]) -> Any:
+    from relationship import relationship_graph
+
+    c = relationship_graph.chord_labels[
+        relationship_graph.id(_param(params, "chord_label"))
+    ]
+    type = params.get("type")
+    if type is not None:
+        # Unknown relationship types raise KeyError, as unknown chord labels do
+        relationship_graph.type_id(type)
+    return [
+        RelationshipRecord(type_name, c, cl).plain()
+        for (type_name, cl) in relationship_graph.edges(c)
+        if type is None or type_name == type
+    ]
+
+
+def transpose(params: dict[str, str]) -> Any:
+    i = interval_index.get(_param(params, "interval"))
+    if "symbol" in params:
+        c = parse_chord_symbol(params["symbol"])
+        if c is None:
+            raise ValueError(f"Invalid chord symbol {params['symbol']}")
+        transposed = ChordSymbol(
+            c.root.add(i), c.chord_label, None if c.bass is None else c.bass.add(i)
+        )
+        return {"symbol": str(transposed)}
+    return {"notes": [n.add(i).name for n in _notes(params)]}
+
+
+endpoints: dict[str, Callable[[dict[str, str]], Any]] = {
+    "/identify": identify,
+    "/scale": scale,
+    "/chords_in_scale": chords_in_scale,
+    "/neighbors": neighbors,
+    "/transpose": transpose,
+}
+
+_reasons = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+def load_indexes():
+    # Build every index the endpoints use, so that no request has to
+    from chord import chord_identification_index
+    from chord_scale_engine import chord_scale_engine
+    from chord_symbol import chord_symbol_parser
+    from relationship import relationship_graph
+
+
+def _response(status: int, value: Any) -> tuple[int, bytes]:
+    return (status, json.dumps(value, ensure_ascii=False).encode("utf8"))
+
+
+class QueryService:
+    def __init__(self, cache_size: int = 4096):
+        self.cache_size = cache_size
+        # Responses by request target, least recently used first, and those computed up front,
+        # which are never evicted
+        self._cache: OrderedDict[str, tuple[int, bytes]] = OrderedDict()
+        self._precomputed: dict[str, tuple[int, bytes]] = dict()
+        # Futures of the responses being computed, and the targets still to compute them for
+        self._in_flight: dict[str, asyncio.Future] = dict()
+        self._pending: list[str] = list()
+
+    def _compute(self, target: str) -> tuple[int, bytes]:
+        try:
+            url = urlsplit(target)
+            if url.fragment:
+                return _response(
+                    400, {"error": "Unencoded # in the URL, send it as %23"}
+                )
+            endpoint = endpoints.get(url.path)
+            if endpoint is None:
+                return _response(404, {"error": f"Unknown endpoint {url.path}"})
+            params = dict(parse_qsl(url.query, keep_blank_values=True))
+            return _response(200, endpoint(params))
+        except KeyError as e:
+            return _response(404, {"error": f"Unknown {e}"})
+        except (ValueError, TypeError) as e:
+            return _response(400, {"error": str(e)})
+        except Exception as e:
+            # A bug rather than a bad request, but the request still gets a response
+            return _response(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def precompute(self):
+        # The scale and chords in scale of every scale, which are the slowest to compute and
+        # there are few of, as targets with the parameters in the order documented above
+        for root in root_note_names:
+            for sl in scale_label_index.values():
+                query = urlencode({"root": root, "scale_label": sl.name})
+                for path in ("/scale", "/chords_in_scale"):
+                    target = f"{path}?{query}"
+                    self._precomputed[target] = self._compute(target)
+
+    def cached(self, target: str) -> tuple[int, bytes] | None:
+        response = self._precomputed.get(target)
+        if response is not None:
+            return response
+        response = self._cache.get(target)
+        if response is not None:
+            self._cache.move_to_end(target)
+        return response
+
+    def submit(self, target: str) -> asyncio.Future:
+        # The future response to a request that isn't cached. Responses are computed on the
+        # event loop, in a callback after every request read so far has been submitted, so
+        # identical requests from any connection share one future.
+        future = self._in_flight.get(target)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._in_flight[target] = loop.create_future()
+            if not self._pending:
+                loop.call_soon(self._compute_pending)
+            self._pending.append(target)
+        return future
+
+    def _compute_pending(self):
+        (pending, self._pending) = (self._pending, list())
+        for target in pending:
+            # Every future is resolved, so no request waits forever
+            response = _response(500, {"error": "Internal error"})
+            try:
+                response = self._compute(target)
+            finally:
+                self._in_flight.pop(target).set_result(response)
+            # Internal errors aren't cached, so they're retried
+            if response[0] != 500:
+                self._cache[target] = response
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+    async def respond(self, target: str) -> tuple[int, bytes]:
+        return self.cached(target) or await self.submit(target)
+
+    async def serve(
+        self, host: str, port: int, started: Callable[[], None] | None = None
+    ):
+        server = await asyncio.get_running_loop().create_server(
+            lambda: _Connection(self), host, port
+        )
+        if started is not None:
+            started()
+        async with server:
+            await server.serve_forever()
+
+
+class _Connection(asyncio.Protocol):
+    # An HTTP/1.1 connection, kept alive until the client closes it or asks to.
+    # Cached responses are written as soon as their request is read, without a task, and the
+    # others once they're computed, in the order the requests arrived.
+    def __init__(self, service: QueryService):
+        self.service = service
+        self.transport: asyncio.Transport | None = None
+        self._buffer = b""
+        # [response, or None until it's computed, whether to keep the connection alive]
+        self._responses: deque[list] = deque()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data: bytes):
+        self._buffer += data
+        while (end := self._buffer.find(b"\r\n\r\n")) >= 0:
+            lines = self._buffer[:end].decode("latin1").split("\r\n")
+            headers = dict()
+            for line in lines[1:]:
+                (name, _, value) = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            try:
+                (method, target, version) = lines[0].split()
+                length = int(headers.get("content-length", "0"))
+            except ValueError:
+                self._request("", "", "HTTP/1.0", headers)
+                return
+            if len(self._buffer) < end + 4 + length:
+                # The rest of the body hasn't arrived yet
+                return
+            self._buffer = self._buffer[end + 4 + length :]
+            self._request(method, target, version, headers)
+
+    def _request(self, method: str, target: str, version: str, headers: dict):
+        keep_alive = (
+            version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        )
+        slot = [None, keep_alive]
+        self._responses.append(slot)
+        if method != "GET":
+            slot[0] = (
+                _response(405, {"error": "Only GET is supported"})
+                if method
+                else _response(400, {"error": "Malformed request"})
+            )
+        else:
+            slot[0] = self.service.cached(target)
+            if slot[0] is None:
+                self.service.submit(target).add_done_callback(
+                    lambda f: self._computed(slot, f)
+                )
+                return
+        self._flush()
+
+    def _computed(self, slot: list, future: asyncio.Future):
+        slot[0] = future.result()
+        self._flush()
+
+    def _flush(self):
+        while self._responses and self._responses[0][0] is not None:
+            ((status, body), keep_alive) = self._responses.popleft()
+            if self.transport is None or self.transport.is_closing():
+                return
+            self.transport.write(
+                f"HTTP/1.1 {status} {_reasons[status]}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                "\r\n".encode("latin1") + body
+            )
+            if not keep_alive:
+                self.transport.close()
+                return
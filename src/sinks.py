@@ -0,0 +1,73 @@
+from itertools import islice
+from typing import IO, Iterable
+import csv
+import json
+
+# Sinks write a stream of records (see records.py) to a file, in batches.
+
+_batch_size = 1000
+
+
+def _batches(records: Iterable) -> Iterable[list]:
+    it = iter(records)
+    while batch := list(islice(it, _batch_size)):
+        yield batch
+
+
+class TextSink:
+    # The original data file format, one line of text per record
+    extension = "txt"
+
+    def __init__(self, f: IO[str]):
+        self.f = f
+
+    def write(self, records: Iterable):
+        for batch in _batches(records):
+            self.f.write("".join([r.text() + "\n" for r in batch]))
+
+
+class JsonlSink:
+    # One JSON object per line
+    extension = "jsonl"
+
+    def __init__(self, f: IO[str]):
+        self.f = f
+
+    def write(self, records: Iterable):
+        for batch in _batches(records):
+            self.f.write(
+                "".join(
+                    [json.dumps(r.plain(), ensure_ascii=False) + "\n" for r in batch]
+                )
+            )
+
+
+class CsvSink:
+    # A header row of field names, then one row per record. Lists are joined with spaces.
+    extension = "csv"
+
+    def __init__(self, f: IO[str]):
+        self.f = f
+        self._writer = csv.writer(f, lineterminator="\n")
+        self._header_written = False
+
+    def write(self, records: Iterable):
+        for batch in _batches(records):
+            rows = [r.plain() for r in batch]
+            if not self._header_written:
+                self._writer.writerow(rows[0].keys())
+                self._header_written = True
+            self._writer.writerows(
+                [
+                    [
+                        " ".join(map(str, v)) if isinstance(v, list) else v
+                        for v in row.values()
+                    ]
+                    for row in rows
+                ]
+            )
+
+
+Sink = TextSink | JsonlSink | CsvSink
+
+sinks: dict[str, type[Sink]] = {s.extension: s for s in (TextSink, JsonlSink, CsvSink)}
@@ -0,0 +1,281 @@
+from interval import interval_index
+from note import Note, root_notes
+from scale_label import scale_label_index
+from typing import Iterable
+import os
+import sqlite3
+
+# Exports intervals, scale labels, scales, chord labels, the chords in each scale, and the
+# relationships between chord labels to a SQLite database.
+#
+# Bitmaps of notes are pitch classes, in semitones above A (see Note.semitone), and bitmaps of
+# labels are the semitones of their intervals, above the root.
+
+_schema = """
+CREATE TABLE intervals (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    major_scale_degree INTEGER NOT NULL,
+    rel_semitones INTEGER NOT NULL,
+    semitones INTEGER NOT NULL
+);
+CREATE TABLE scale_labels (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    bitmap INTEGER NOT NULL
+);
+CREATE TABLE scale_label_intervals (
+    scale_label_id INTEGER NOT NULL REFERENCES scale_labels(id),
+    position INTEGER NOT NULL,
+    interval_id INTEGER NOT NULL REFERENCES intervals(id),
+    PRIMARY KEY (scale_label_id, position)
+);
+CREATE TABLE scales (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    root TEXT NOT NULL,
+    scale_label_id INTEGER NOT NULL REFERENCES scale_labels(id),
+    bitmap INTEGER NOT NULL,
+    notes TEXT NOT NULL
+);
+CREATE TABLE chord_labels (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    intervals TEXT NOT NULL,
+    bitmap INTEGER NOT NULL
+);
+CREATE TABLE chords_in_scale (
+    id INTEGER PRIMARY KEY,
+    scale_id INTEGER NOT NULL REFERENCES scales(id),
+    chord_root TEXT NOT NULL,
+    chord_label_id INTEGER NOT NULL REFERENCES chord_labels(id),
+    bitmap INTEGER NOT NULL,
+    notes TEXT NOT NULL
+);
+CREATE TABLE chord_in_scale_notes (
+    chord_in_scale_id INTEGER NOT NULL REFERENCES chords_in_scale(id),
+    position INTEGER NOT NULL,
+    note TEXT NOT NULL,
+    rel_octave INTEGER NOT NULL,
+    PRIMARY KEY (chord_in_scale_id, position)
+);
+CREATE TABLE relationships (
+    id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    c1_id INTEGER NOT NULL REFERENCES chord_labels(id),
+    c2_id INTEGER NOT NULL REFERENCES chord_labels(id)
+);
+"""
+
+# Created after the rows are inserted, which is quicker than maintaining them during the inserts
+_indexes = """
+CREATE INDEX scales_root ON scales(root);
+CREATE INDEX scales_scale_label ON scales(scale_label_id);
+CREATE INDEX scales_bitmap ON scales(bitmap);
+CREATE INDEX chord_labels_bitmap ON chord_labels(bitmap);
+CREATE INDEX chords_in_scale_scale ON chords_in_scale(scale_id);
+CREATE INDEX chords_in_scale_root ON chords_in_scale(chord_root);
+CREATE INDEX chords_in_scale_label ON chords_in_scale(chord_label_id);
+CREATE INDEX chords_in_scale_bitmap ON chords_in_scale(bitmap);
+CREATE INDEX chord_in_scale_notes_note ON chord_in_scale_notes(note);
+CREATE INDEX relationships_type ON relationships(type);
+CREATE INDEX relationships_c1 ON relationships(c1_id, type);
+CREATE INDEX relationships_c2 ON relationships(c2_id, type);
+"""
+
+
+def _pitch_classes(notes: Iterable[Note]) -> int:
+    bitmap = 0
+    for n in notes:
+        bitmap |= 1 << n.semitone
+    return bitmap
+
+
+def export_sqlite(path: str):
+    from chord_scale_engine import chord_scale_engine
+    from relationship import relationships
+    from scale import Scale
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("BEGIN")
+        for statement in _schema.split(";"):
+            conn.execute(statement)
+
+        interval_ids = {i: x for (x, i) in enumerate(interval_index.values)}
+        conn.executemany(
+            "INSERT INTO intervals VALUES (?, ?, ?, ?, ?)",
+            [
+                (x, i.name, i.major_scale_degree, i.rel_semitones, i.semitones)
+                for (i, x) in interval_ids.items()
+            ],
+        )
+
+        scale_labels = list(scale_label_index.values())
+        conn.executemany(
+            "INSERT INTO scale_labels VALUES (?, ?, ?)",
+            [
+                (x, sl.name, sl.semitone_bitmap.bitmap)
+                for (x, sl) in enumerate(scale_labels)
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO scale_label_intervals VALUES (?, ?, ?)",
+            [
+                (x, position, interval_ids[i])
+                for (x, sl) in enumerate(scale_labels)
+                for (position, i) in enumerate(sl.intervals)
+            ],
+        )
+
+        chord_labels = chord_scale_engine.chord_labels
+        chord_label_ids = {cl.name: x for (x, cl) in enumerate(chord_labels)}
+        conn.executemany(
+            "INSERT INTO chord_labels VALUES (?, ?, ?, ?)",
+            [
+                (
+                    x,
+                    cl.name,
+                    " ".join(i.name for i in cl.intervals),
+                    cl.semitone_bitmap.bitmap,
+                )
+                for (x, cl) in enumerate(chord_labels)
+            ],
+        )
+
+        scales: list[tuple] = list()
+        chords: list[tuple] = list()
+        chord_notes: list[tuple] = list()
+        for x, sl in enumerate(scale_labels):
+            for r in root_notes:
+                s = Scale(r, sl)
+                scale_id = len(scales)
+                scales.append(
+                    (
+                        scale_id,
+                        s.name,
+                        r.name,
+                        x,
+                        s.pitch_class_bitmap,
+                        " ".join(n.name for n in s.notes),
+                    )
+                )
+                for chord_root, cl, notes in chord_scale_engine.chords_in_scale(sl, r):
+                    chord_id = len(chords)
+                    chords.append(
+                        (
+                            chord_id,
+                            scale_id,
+                            chord_root.name,
+                            chord_label_ids[cl.name],
+                            _pitch_classes(notes),
+                            " ".join(n.name for n in notes),
+                        )
+                    )
+                    chord_notes += [
+                        (chord_id, position, n.name, n.rel_octave)
+                        for (position, n) in enumerate(notes)
+                    ]
+        conn.executemany("INSERT INTO scales VALUES (?, ?, ?, ?, ?, ?)", scales)
+        conn.executemany(
+            "INSERT INTO chords_in_scale VALUES (?, ?, ?, ?, ?, ?)", chords
+        )
+        conn.executemany(
+            "INSERT INTO chord_in_scale_notes VALUES (?, ?, ?, ?)", chord_notes
+        )
+
+        conn.executemany(
+            "INSERT INTO relationships (type, c1_id, c2_id) VALUES (?, ?, ?)",
+            [
+                (
+                    rel.type.name,
+                    chord_label_ids[rel.c1.name],
+                    chord_label_ids[rel.c2.name],
+                )
+                for rel in relationships
+            ],
+        )
+
+        for statement in _indexes.split(";"):
+            conn.execute(statement)
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+
+### Queries
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def chords_in_scale_with_notes(
+    conn: sqlite3.Connection,
+    scale_label_name: str,
+    notes: Iterable[str | Note] = (),
+    chord_label_glob: str = "*",
+    root: str | None = None,
+) -> list[sqlite3.Row]:
+    # Chords in every scale with this label (or only the one on the given root), whose chord
+    # label name matches the glob, and that contain the given notes or their enharmonics.
+    # For example, all m7 family chords in dorian that include F#:
+    #   chords_in_scale_with_notes(conn, "dorian", ["F#"], "m7*")
+    bitmap = _pitch_classes(n if isinstance(n, Note) else Note(n) for n in notes)
+    return conn.execute(
+        """
+        SELECT s.name AS scale, c.chord_root, cl.name AS chord_label, c.notes
+        FROM chords_in_scale c
+        JOIN scales s ON s.id = c.scale_id
+        JOIN scale_labels sl ON sl.id = s.scale_label_id
+        JOIN chord_labels cl ON cl.id = c.chord_label_id
+        WHERE sl.name = ?
+            AND (? IS NULL OR s.root = ?)
+            AND cl.name GLOB ?
+            AND c.bitmap & ? = ?
+        ORDER BY c.id
+        """,
+        (scale_label_name, root, root, chord_label_glob, bitmap, bitmap),
+    ).fetchall()
+
+
+def scales_containing_notes(
+    conn: sqlite3.Connection, notes: Iterable[str | Note]
+) -> list[sqlite3.Row]:
+    bitmap = _pitch_classes(n if isinstance(n, Note) else Note(n) for n in notes)
+    return conn.execute(
+        "SELECT name, root, notes FROM scales WHERE bitmap & ? = ? ORDER BY id",
+        (bitmap, bitmap),
+    ).fetchall()
+
+
+def chord_labels_with_bitmap(
+    conn: sqlite3.Connection, bitmap: int
+) -> list[sqlite3.Row]:
+    # Chord labels with exactly these semitones above the root (see IntervalSet.semitone_bitmap)
+    return conn.execute(
+        "SELECT name, intervals FROM chord_labels WHERE bitmap = ? ORDER BY id",
+        (bitmap,),
+    ).fetchall()
+
+
+def related_chord_labels(
+    conn: sqlite3.Connection, chord_label_name: str, rel_type: str | None = None
+) -> list[sqlite3.Row]:
+    return conn.execute(
+        """
+        SELECT r.type, c2.name AS chord_label
+        FROM relationships r
+        JOIN chord_labels c1 ON c1.id = r.c1_id
+        JOIN chord_labels c2 ON c2.id = r.c2_id
+        WHERE c1.name = ? AND (? IS NULL OR r.type = ?)
+        ORDER BY r.id
+        """,
+        (chord_label_name, rel_type, rel_type),
+    ).fetchall()
@@ -0,0 +1,199 @@
+from chord import Chord
+from chord_label import ChordLabel
+from collections import namedtuple
+from functools import cache
+from interval import interval_index
+from note import Note
+from prettify import prettify
+from scale_label import ScaleLabel
+from typing import Iterable, Iterator
+
+# Voicings of chords: the chord's notes placed at MIDI pitches (where middle C is 60).
+#
+# Voicings are enumerated lowest voice first, and each voice's candidate pitches are a bitmap
+# over the MIDI pitches, that is narrowed with the constraints before any pitch is tried:
+# range and span, the chord's pitch classes, pitch classes that can't be doubled or must still
+# be placed, and pitches that would be a b9 above a lower voice.
+
+_letter_pitch_classes = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+
+# Bitmaps of the pitches that are a b9 above each pitch, or a b9 and some octaves
+_b9_above = [sum(1 << q for q in range(p + 13, 128, 12)) for p in range(128)]
+
+
+def midi_pitch_class(n: Note) -> int:
+    # Note.semitone is above A, and MIDI pitch classes are above C
+    return (n.semitone + 9) % 12
+
+
+def note_octave(n: Note, pitch: int) -> int:
+    # The octave number of a note spelled at a MIDI pitch, e.g. C4 and B#3 are both 60
+    accidental = n.name.count("#") - n.name.count("b")
+    return (pitch - accidental - _letter_pitch_classes[n.name[0]]) // 12 - 1
+
+
+@cache
+def _pitch_class_mask(pitch_classes: int) -> int:
+    # Bitmap of every MIDI pitch in a 12-bit bitmap of pitch classes
+    mask = 0
+    for pc in range(12):
+        if pitch_classes & (1 << pc):
+            mask |= sum(1 << p for p in range(pc, 128, 12))
+    return mask
+
+
+class Voicing(namedtuple("Voicing", ["pitches", "notes"])):
+    # The MIDI pitches of the voices, lowest first, and the chord's note at each of them
+    def text(self) -> str:
+        return " ".join(
+            f"{prettify(n.name)}{note_octave(n, p)}"
+            for (p, n) in zip(self.pitches, self.notes)
+        )
+
+    def __repr__(self):
+        return self.text()
+
+
+# Constraints on voicings:
+# * low, high: The range of MIDI pitches of the instrument
+# * max_span: The most semitones between the lowest and highest voices
+# * voices: The number of voices, doubling notes as needed, or None for one voice for each of
+#   the chord's notes that isn't omitted, without doubling
+# * omittable: Intervals of the chord that don't need to be voiced, e.g. ("1", "5")
+# * root_position: Whether the lowest voice must be the root
+# * allow_internal_b9: Whether any voice can be a b9 above another. A b9 above the root is
+#   always allowed in chords that have one, like 7b9.
+VoicingConstraints = namedtuple(
+    "VoicingConstraints",
+    [
+        "low",
+        "high",
+        "max_span",
+        "voices",
+        "omittable",
+        "root_position",
+        "allow_internal_b9",
+    ],
+    defaults=[48, 84, 24, None, (), False, False],
+)
+
+
+def voicings(
+    root: Note,
+    chord_label: ChordLabel,
+    constraints: VoicingConstraints = VoicingConstraints(),
+    notes: Iterable[Note] | None = None,
+) -> Iterator[Voicing]:
+    # Every voicing of the chord that meets the constraints, from the lowest bass up.
+    # The chord's notes are spelled from the root, unless they're given, e.g. as spelled in a
+    # scale.
+    c = constraints
+    notes = (
+        [root.add(i) for i in chord_label.intervals] if notes is None else list(notes)
+    )
+    omittable = {interval_index.get(i) for i in c.omittable}
+
+    # 12-bit bitmaps of the chord's pitch classes, and the chord's note at each MIDI pitch
+    pitch_classes = 0
+    required = 0
+    spelling: list[Note | None] = [None] * 128
+    for i, n in zip(chord_label.intervals, notes):
+        pc = midi_pitch_class(n)
+        if not pitch_classes & (1 << pc):
+            spelling[pc::12] = [Note(n.name)] * len(range(pc, 128, 12))
+        pitch_classes |= 1 << pc
+        if i not in omittable:
+            required |= 1 << pc
+    root_pc = midi_pitch_class(root)
+    root_b9 = any(i.semitones % 12 == 1 for i in chord_label.intervals)
+
+    if c.voices is None:
+        (min_voices, max_voices, doubling) = (
+            required.bit_count(),
+            pitch_classes.bit_count(),
+            False,
+        )
+    else:
+        (min_voices, max_voices, doubling) = (c.voices, c.voices, True)
+    if max_voices == 0:
+        return
+
+    in_range = ((1 << (c.high + 1)) - 1) & ~((1 << c.low) - 1)
+    candidates = in_range & _pitch_class_mask(pitch_classes)
+    if c.root_position:
+        first = candidates & _pitch_class_mask(1 << root_pc)
+    else:
+        first = candidates
+
+    # Depth first, with a stack of the pitches still to try for each voice, and of the pitch
+    # classes voiced and pitches ruled out by b9s below each voice
+    check_b9 = not c.allow_internal_b9
+    voicing: list[int] = list()
+    stack = [first]
+    covered_stack = [0]
+    forbidden_stack = [0]
+    # The pitches within the span of the lowest voice
+    below_top = 0
+    while stack:
+        next_pitches = stack[-1]
+        if not next_pitches:
+            stack.pop()
+            covered_stack.pop()
+            forbidden_stack.pop()
+            if voicing:
+                voicing.pop()
+            continue
+        bit = next_pitches & -next_pitches
+        stack[-1] = next_pitches ^ bit
+        p = bit.bit_length() - 1
+        pc = p % 12
+
+        voicing.append(p)
+        voices = len(voicing)
+        if voices == 1:
+            below_top = (2 << min(c.high, p + c.max_span)) - 1
+        covered = covered_stack[-1] | (1 << pc)
+        if voices >= min_voices and covered & required == required:
+            yield Voicing(tuple(voicing), tuple([spelling[q] for q in voicing]))
+
+        # The pitches the next voice can take
+        remaining = max_voices - voices
+        missing = (required & ~covered).bit_count()
+        if remaining == 0 or missing > remaining:
+            voicing.pop()
+            continue
+        forbidden = forbidden_stack[-1]
+        if check_b9 and not (pc == root_pc and root_b9):
+            forbidden |= _b9_above[p]
+        next_pitches = candidates & below_top & ~((2 << p) - 1) & ~forbidden
+        if not doubling:
+            # Without doubling, each voice takes a pitch class that isn't voiced yet
+            next_pitches &= ~_pitch_class_mask(covered)
+        if missing == remaining:
+            # Every remaining voice has to be one of the missing notes
+            next_pitches &= _pitch_class_mask(required & ~covered)
+        if not next_pitches:
+            voicing.pop()
+            continue
+        stack.append(next_pitches)
+        covered_stack.append(covered)
+        forbidden_stack.append(forbidden)
+
+
+def chord_voicings(
+    chord: Chord, constraints: VoicingConstraints = VoicingConstraints()
+) -> Iterator[Voicing]:
+    return voicings(chord.root, chord.chord_label, constraints, chord.notes)
+
+
+def scale_voicings(
+    sl: ScaleLabel, root: Note, constraints: VoicingConstraints = VoicingConstraints()
+) -> Iterator[tuple[Note, ChordLabel, Voicing]]:
+    # Every voicing of every chord in the scale, spelled as in the scale
+    from chord_scale_engine import chord_scale_engine
+
+    for chord_root, chord_label, chord_notes in chord_scale_engine.chords_in_scale(
+        sl, root
+    ):
+        for v in voicings(chord_root, chord_label, constraints, chord_notes):
+            yield (chord_root, chord_label, v)